@@ -1,6 +1,9 @@
 import argparse
+import os
+import subprocess
 from pathlib import Path
 from shutil import copytree
+from time import perf_counter
 
 from .app import App
 from .project import ProjectContext, load_project
@@ -11,14 +14,23 @@ def _create_new_project(project_dir: Path):
     copytree(template_dir, project_dir)
 
 
-def _ffmpeg_movie_stitch(out_dir: Path, src_FPS: float):
+def _ffmpeg_movie_stitch(config: dict):
     movie_FPS = 60
-    img_path = str(out_dir / "frame_%05d.png")
+    out_dir: Path = config["out_dir"]
+    img_path = str(out_dir / f"frame_%05d.{config['export_format']}")
     movie_path = str(out_dir / "movie.mp4")
-    command = f"ffmpeg -framerate {src_FPS} -i {img_path} -c:v libx264 -pix_fmt yuv420p -vf scale=out_color_matrix=bt709 -r {movie_FPS} {movie_path}"  # noqa: E501
-    from os import system
-
-    system(command)
+    command = [
+        config["ffmpeg_path"],
+        "-framerate",
+        str(config["FPS"]),
+        "-i",
+        img_path,
+        *config["ffmpeg_args"],
+        "-r",
+        str(movie_FPS),
+        movie_path,
+    ]
+    subprocess.run(command, check=True)
 
 
 def _main():
@@ -38,6 +50,18 @@ def _main():
         action="store_true",
         help="produce a .mp4 file, composing .png files from out directory",
     )
+    parser.add_argument(
+        "-r",
+        "--render",
+        action="store_true",
+        help="render the record range without a display, as fast as possible",
+    )
+    parser.add_argument(
+        "-p",
+        "--profile",
+        action="store_true",
+        help="record per-frame stage timings into the out directory",
+    )
 
     args = parser.parse_args()
 
@@ -48,12 +72,29 @@ def _main():
     project: ProjectContext = load_project(args.project_dir)
 
     if args.movie:
-        _ffmpeg_movie_stitch(project.config["out_dir"], project.config["FPS"])
+        if project.config["export_format"] == "ffmpeg":
+            parser.error("--movie stitches image files, ffmpeg export writes movie.mp4")
+        _ffmpeg_movie_stitch(project.config)
         return
 
-    app = App()
+    if args.profile:
+        project.config["profile"] = True
+
+    if args.render:
+        record = project.config["record"]
+        if record[0] < 0 or record[1] <= record[0]:
+            parser.error("--render needs a record range in settings.CONFIG")
+        # read when App initializes pygame
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
 
+    app = App(render=args.render)
+    start = perf_counter()
     app.run(project)
+    if args.render:
+        frames = app.frame - record[0]
+        print(f"rendered {frames} frames in {perf_counter() - start:.2f}s")
+        stats = app.export_stats()
+        print(", ".join(f"{key} {value:.4g}" for key, value in stats.items()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,289 @@
+from bisect import bisect_left
+from operator import attrgetter
+
+import numpy as np
+
+from .core import (
+    ANIMATION_OP,
+    STYLE_ATTRS,
+    AnimatedBuffer,
+    AnimatedDot,
+    AnimationOp,
+    Buffer,
+    Style,
+)
+
+SET = ANIMATION_OP.SET.value
+STOP = ANIMATION_OP.STOP.value
+JMP = ANIMATION_OP.JMP.value
+MOVE = ANIMATION_OP.MOVE.value
+MOVE_TO = ANIMATION_OP.MOVE_TO.value
+
+
+def _native(dot) -> bool:
+    return isinstance(dot, AnimatedDot) and type(dot).advance is AnimatedDot.advance
+
+
+class VectorAnimatedBuffer(AnimatedBuffer):
+    """AnimatedBuffer advancing its AnimatedDots with NumPy.
+
+    Instructions are compiled into shared op arrays (counter, op type, two
+    argument columns, a JMP keeps its target frame and op index) when a dot
+    is first advanced, dots sharing one instructions list or
+    AnimationProgram share the compiled ops. Every frame all dots step
+    through their ops together, one op per dot per step. SETs of appearance
+    attributes work on Style ids through a cache of transitions, other SETs
+    call into the dot. Styles, moves and removals are then applied in put
+    order, so the buffer ends up as with AnimatedBuffer.
+    While compiled, a dot's style, frame_counter, instruction_pointer and
+    new_pos are held here. Call `sync` before changing or reading them or
+    adding ops, the next advance compiles again. Dots overriding `advance`
+    are called as usual.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._reset()
+
+    def sync(self):
+        self._write_back(range(self._compiled))
+        self._reset()
+
+    def _reset(self):
+        self._compiled: int = 0
+        self._programs: dict[int, tuple[list[AnimationOp], int, int]] = dict()
+        self._sets: list[tuple[str, object]] = []
+        self._styles: dict[int, Style] = dict()
+        self._transitions: dict[int, int] = dict()
+        self._op_counter = np.zeros(0, np.int64)
+        self._op_type = np.zeros(0, np.int8)
+        self._op_arg = np.zeros((0, 2), np.int64)
+        self._set_is_style = np.zeros(0, np.bool_)
+        self._native = np.zeros(0, np.bool_)
+        self._start = np.zeros(0, np.int64)
+        self._length = np.zeros(0, np.int64)
+        self._frame = np.zeros(0, np.int64)
+        self._ip = np.zeros(0, np.int64)
+        self._offset = np.zeros(0, np.int64)
+        self._pos = np.zeros((0, 2), np.int64)
+        self._has_new = np.zeros(0, np.bool_)
+        self._new_pos = np.zeros((0, 2), np.int64)
+        self._style = np.zeros(0, np.int64)
+
+    def _write_back(self, indices):
+        for k in indices:
+            if self._native[k]:
+                dot = self.animated_dots[k]
+                dot.style = self._styles[int(self._style[k])]
+                dot.frame_counter = int(self._frame[k])
+                dot.instruction_pointer = int(self._ip[k])
+                dot.new_pos = (
+                    tuple(self._new_pos[k].tolist()) if self._has_new[k] else None
+                )
+
+    def _compile_ops(self, instructions: list[AnimationOp], rows: list) -> int:
+        program = self._programs.get(id(instructions))
+        if program is not None and program[2] == len(instructions):
+            return program[1]
+        start = len(self._op_counter) + len(rows)
+        for op in instructions:
+            match op.op_type:
+                case ANIMATION_OP.SET:
+                    args = (len(self._sets), 0)
+                    self._sets.append(op.args)
+                case ANIMATION_OP.JMP:
+                    dst = op.args[0]
+                    args = (
+                        dst,
+                        bisect_left(instructions, dst, key=attrgetter("counter")),
+                    )
+                case ANIMATION_OP.MOVE | ANIMATION_OP.MOVE_TO:
+                    args = op.args[0]
+                case _:
+                    args = (0, 0)
+            rows.append((op.counter, op.op_type.value, *args))
+        # the list is kept so its id is not reused while compiled
+        self._programs[id(instructions)] = instructions, start, len(instructions)
+        return start
+
+    def _compile_pending(self):
+        new_dots = self.animated_dots[self._compiled :]
+        if not new_dots:
+            return
+        rows = []
+        native, start, length, frame, ip, offset = [], [], [], [], [], []
+        pos, has_new, new_pos, style = [], [], [], []
+        for dot in new_dots:
+            is_native = _native(dot)
+            native.append(is_native)
+            if not is_native:
+                start.append(0)
+                length.append(0)
+                frame.append(0)
+                ip.append(0)
+                offset.append(0)
+                pos.append((0, 0))
+                has_new.append(False)
+                new_pos.append((0, 0))
+                style.append(0)
+                continue
+            start.append(self._compile_ops(dot.instructions, rows))
+            length.append(len(dot.instructions))
+            frame.append(dot.frame_counter)
+            ip.append(dot.instruction_pointer)
+            offset.append(dot.time_offset)
+            pos.append(dot.pos or (0, 0))
+            has_new.append(bool(dot.new_pos))
+            new_pos.append(dot.new_pos or (0, 0))
+            style.append(dot.style.id)
+            self._styles[dot.style.id] = dot.style
+
+        if rows:
+            self._set_is_style = np.array(
+                [name in STYLE_ATTRS for name, _ in self._sets], np.bool_
+            )
+            ops = np.array(rows, np.int64)
+            self._op_counter = np.concatenate((self._op_counter, ops[:, 0]))
+            self._op_type = np.concatenate((self._op_type, ops[:, 1].astype(np.int8)))
+            self._op_arg = np.concatenate((self._op_arg, ops[:, 2:]))
+        self._native = np.concatenate((self._native, native))
+        self._start = np.concatenate((self._start, start))
+        self._length = np.concatenate((self._length, length))
+        self._frame = np.concatenate((self._frame, frame))
+        self._ip = np.concatenate((self._ip, ip))
+        self._offset = np.concatenate((self._offset, offset))
+        self._pos = np.concatenate((self._pos, np.array(pos, np.int64)))
+        self._has_new = np.concatenate((self._has_new, has_new))
+        self._new_pos = np.concatenate((self._new_pos, np.array(new_pos, np.int64)))
+        self._style = np.concatenate((self._style, style))
+        self._compiled = len(self.animated_dots)
+
+    def _set_styles(self, dots: np.ndarray, set_idx: np.ndarray):
+        # one transition per distinct (style, SET) pair
+        keys, inverse = np.unique(
+            self._style[dots] << 32 | set_idx, return_inverse=True
+        )
+        new_ids = []
+        for key in keys.tolist():
+            new_id = self._transitions.get(key)
+            if new_id is None:
+                style_id, idx = key >> 32, key & 0xFFFFFFFF
+                style = self._styles[style_id].transition(*self._sets[idx])
+                self._styles[style.id] = style
+                new_id = self._transitions[key] = style.id
+            new_ids.append(new_id)
+        self._style[dots] = np.array(new_ids, np.int64)[inverse]
+
+    def _step(self) -> tuple[np.ndarray, np.ndarray]:
+        frame, ip = self._frame, self._ip
+        stopped = np.zeros(len(frame), np.bool_)
+        restyled = np.zeros(len(frame), np.bool_)
+        active = np.flatnonzero(self._length)
+        while active.size:
+            active = active[ip[active] < self._length[active]]
+            op = self._start[active] + ip[active]
+            ready = frame[active] >= self._op_counter[op] + self._offset[active]
+            active, op = active[ready], op[ready]
+            if not active.size:
+                break
+            op_type = self._op_type[op]
+
+            is_set = op_type == SET
+            if is_set.any():
+                set_dots = active[is_set]
+                set_idx = self._op_arg[op[is_set], 0]
+                is_style = self._set_is_style[set_idx]
+                self._set_styles(set_dots[is_style], set_idx[is_style])
+                restyled[set_dots[is_style]] = True
+                for k, idx in zip(
+                    set_dots[~is_style].tolist(), set_idx[~is_style].tolist()
+                ):
+                    name, value = self._sets[idx]
+                    setattr(self.animated_dots[k], name, value)
+                    if name == "pos" and value is not None:
+                        self._pos[k] = value
+
+            is_jmp = op_type == JMP
+            jumped = active[is_jmp]
+            frame[jumped] = self._op_arg[op[is_jmp], 0] + self._offset[jumped]
+            ip[jumped] = self._op_arg[op[is_jmp], 1] - 1
+
+            is_move = op_type == MOVE
+            moved = active[is_move]
+            self._has_new[moved] = True
+            self._new_pos[moved] = self._pos[moved] + self._op_arg[op[is_move]]
+
+            is_move_to = op_type == MOVE_TO
+            moved = active[is_move_to]
+            self._has_new[moved] = True
+            self._new_pos[moved] = self._op_arg[op[is_move_to]]
+
+            ip[active] += 1
+            is_stop = op_type == STOP
+            stopped[active[is_stop]] = True
+            active = active[~is_stop]
+        frame[self._native] += 1
+        return stopped, restyled
+
+    def advance(self):
+        self._compile_pending()
+        stopped, restyled = self._step()
+        for k, style_id in zip(
+            np.flatnonzero(restyled).tolist(), self._style[restyled].tolist()
+        ):
+            self.animated_dots[k].style = self._styles[style_id]
+
+        dead_dots_idx = []
+        moved = self._has_new & ~stopped
+        changed = np.flatnonzero(moved | stopped | ~self._native)
+        changes = zip(
+            changed.tolist(),
+            self._native[changed].tolist(),
+            stopped[changed].tolist(),
+            self._new_pos[changed].tolist(),
+        )
+        self._pos[moved] = self._new_pos[moved]
+        self._has_new[moved] = False
+        for k, native, dead, new_pos in changes:
+            dot = self.animated_dots[k]
+            if native:
+                if dead:
+                    dead_dots_idx.append(k)
+                    continue
+                new_pos = tuple(new_pos)
+            else:
+                if not dot.advance():
+                    dead_dots_idx.append(k)
+                    continue
+                if not dot.new_pos:
+                    continue
+                new_pos = dot.new_pos
+                dot.new_pos = None
+            Buffer.erase(self, dot)
+            dot.pos = new_pos
+            Buffer.put(self, dot)
+
+        if dead_dots_idx:
+            self._write_back(dead_dots_idx)
+            for k in dead_dots_idx:
+                self.erase(self.animated_dots[k])
+            keep = np.ones(len(self.animated_dots), np.bool_)
+            keep[dead_dots_idx] = False
+            self.animated_dots = [
+                dot for dot, kept in zip(self.animated_dots, keep) if kept
+            ]
+            for name in (
+                "_native",
+                "_start",
+                "_length",
+                "_frame",
+                "_ip",
+                "_offset",
+                "_pos",
+                "_has_new",
+                "_new_pos",
+                "_style",
+            ):
+                setattr(self, name, getattr(self, name)[keep])
+            self._compiled = len(self.animated_dots)
+        self.counter += 1
@@ -3,7 +3,9 @@ from itertools import chain
 from multiprocessing import Queue
 from pathlib import Path
 from queue import Empty as QueueEmpty
+from time import perf_counter
 
+import numpy as np
 import pygame
 from pygame import (
     KEYDOWN,
@@ -13,16 +15,24 @@ from pygame import (
     MOUSEBUTTONUP,
     MOUSEMOTION,
     QUIT,
+    RENDER_DEVICE_RESET,
+    RENDER_TARGETS_RESET,
     Rect,
     Surface,
 )
-from pygame._sdl2 import Renderer, Texture, Window
+from pygame._sdl2 import Image, Renderer, Texture, Window
 from pygame.event import Event, event_name
 from pygame.time import Clock
 
+from .cache import LRUCache
+from .core import Dot
+from .export import FFmpegRecorder, FrameWriter
 from .font import FontBank
+from .grid import LAYER_DTYPE
+from .profiling import FrameProfiler
 from .project import ProjectContext
-from .render import Canvas, generate_dot_tex
+from .render import Canvas, GlyphAtlas, render_dot_surface
+from .transport import SharedFrameRing
 
 
 class PickableEvent:
@@ -58,25 +68,86 @@ class PickableEvent:
 class ACTION_MSG(Enum):
     REGISTER_DOTS = auto()
     RENDER = auto()
+    RENDER_SHARED = auto()
+    RENDER_GRID = auto()
     CLEAR = auto()
+    CLEAR_BLOCKS = auto()
     UPDATE = auto()
+    PROFILE = auto()
     QUIT = auto()
 
 
+# followed by their data on the data queue
+DATA_MSGS = frozenset(
+    (
+        ACTION_MSG.REGISTER_DOTS,
+        ACTION_MSG.RENDER,
+        ACTION_MSG.RENDER_SHARED,
+        ACTION_MSG.RENDER_GRID,
+        ACTION_MSG.CLEAR_BLOCKS,
+        ACTION_MSG.UPDATE,
+        ACTION_MSG.PROFILE,
+    )
+)
+# draw on the canvas, anything before a CLEAR is not visible
+CANVAS_MSGS = frozenset(
+    (
+        ACTION_MSG.RENDER,
+        ACTION_MSG.RENDER_SHARED,
+        ACTION_MSG.RENDER_GRID,
+        ACTION_MSG.CLEAR,
+        ACTION_MSG.CLEAR_BLOCKS,
+    )
+)
+SYNC_MODES = ("lockstep", "pipelined", "latest")
+
+
 class App:
-    def __init__(self):
+    def __init__(self, render: bool = False):
+        """With `render` the window stays hidden, frames are stepped as fast
+        as they are drawn unless `real_time` is set, and the app quits after
+        the `record` range. Pair it with a dummy or offscreen SDL video driver
+        on machines without a display.
+
+        Callback messages are `(frame, ACTION_MSG)` pairs, event batches carry
+        the App frame. The callback starts its frame n once App has sent the
+        events of frame n - `ahead`. In `lockstep` sync `ahead` is 0 and App
+        waits for each callback frame. `pipelined` lets the callback run
+        `sync_ahead` frames ahead, App still presents every frame in order.
+        In `latest` App never waits: every window frame it handles the
+        callback frames that are complete, skips canvas work hidden by a
+        later CLEAR and presents the newest one.
+        """
         if not pygame.get_init():
             pygame.init()
 
-        self._window: Window = Window(resizable=True)
+        self.render: bool = render
+        self._window: Window = Window(resizable=not render, hidden=render)
         self._renderer: Renderer = Renderer(self._window, target_texture=True)
-        self._cached_renders: dict[int, Texture] = dict()
+        self._cached_renders: LRUCache = LRUCache()
+        self._evicted_hashes: list[int] = []
+        # evicted renders callback frames in flight may still use
+        self._retired: dict[int, tuple[Image, int, int]] = dict()
+        self._atlas: GlyphAtlas | None = None
         self._font_bank = FontBank()
 
-        self._msg_q: Queue[ACTION_MSG] = Queue()
+        self._msg_q: Queue[tuple[int, ACTION_MSG]] = Queue()
         self._data_q: Queue = Queue()
 
         self._event_q: Queue = Queue()
+        self._frame_ring: SharedFrameRing | None = None
+        self._writer: FrameWriter | None = None
+        self._recorder: FFmpegRecorder | None = None
+        self._profiler = FrameProfiler("app")
+        self._overlay: Texture | None = None
+        self.show_overlay: bool = False
+
+        self.sync: str = "lockstep"
+        self.ahead: int = 0
+        # newest callback frame handled and the App frame it answered
+        self.callback_frame: int = -1
+        self._answered: int = -1
+        self._pending: list[tuple[int, ACTION_MSG, object]] = []
 
         self.running = False
         self.frame: int = -1
@@ -87,22 +158,64 @@ class App:
 
     def run(self, project: ProjectContext):
         self._current_project = project
+
+        render_size = project.config["render_size"]
+        self._window.size = render_size
+        self._renderer.logical_size = render_size
+
         self._canvas = Canvas(
             project.config["shape"],
             project.config["full_res"],
             project.config["backcolor"],
             self._renderer,
         )
-
-        render_size = project.config["render_size"]
-        self._window.size = render_size
-        self._renderer.logical_size = render_size
+        self._atlas = GlyphAtlas(self._renderer, project.config["atlas_page_size"])
+        self._cached_renders.max_entries = project.config["cache_max_entries"]
+        self._cached_renders.max_bytes = project.config["cache_max_bytes"]
+
+        config = project.config
+        streaming = config["export_format"] == "ffmpeg"
+        # screenshots stay png files while the record range is streamed
+        self._writer = FrameWriter(
+            "png" if streaming else config["export_format"],
+            config["export_png_level"],
+            config["export_workers"],
+            config["export_max_pending"],
+        )
+        if streaming:
+            self._recorder = FFmpegRecorder(
+                config["out_dir"] / "movie.mp4",
+                config["FPS"],
+                config["export_max_pending"],
+                config["ffmpeg_path"],
+                config["ffmpeg_args"],
+            )
+
+        if config["sync"] not in SYNC_MODES:
+            raise ValueError(f"unknown sync {config['sync']!r}, expected {SYNC_MODES}")
+        self.sync = config["sync"]
+        self.ahead = 0 if self.sync == "lockstep" else config["sync_ahead"]
+
+        self._profiler.history = config["profile_history"]
+        self._profiler.enabled = config["profile"] or self.show_overlay
 
         for font_info in project.fonts_info:
             self._font_bank.load(font_info)
 
+        if project.config["transport"] == "shared_memory":
+            self._frame_ring = SharedFrameRing(
+                project.config["shape"],
+                project.config["shm_slots"],
+                project.config["shm_slot_size"],
+            )
+
         self._callback_process = project.callback_module.Callback(
-            self._msg_q, self._data_q, self._event_q
+            self._msg_q,
+            self._data_q,
+            self._event_q,
+            self._frame_ring,
+            project.config["diff"],
+            self.ahead,
         )
         self._callback_process.start()
 
@@ -112,12 +225,18 @@ class App:
     def _get_screenshot_filename(self, _frame: int | None = None):
         if _frame is None:
             _frame = self.frame
-        return self._current_project.config["out_dir"] / f"frame_{_frame:0>5}.png"
+        out_dir = self._current_project.config["out_dir"]
+        return out_dir / f"frame_{_frame:0>5}{self._writer.suffix}"
 
     def _screenshot(self, filename: str | Path):
-        filename = str(filename)
         screen: Surface = self._renderer.to_surface()
-        pygame.image.save(screen, filename)
+        self._writer.write(filename, screen)
+
+    def _record(self):
+        if self._recorder:
+            self._recorder.write(self._renderer.to_surface())
+        else:
+            self._screenshot(self._get_screenshot_filename())
 
     def _process_events(self):
         self.running = not pygame.event.peek(QUIT)
@@ -125,14 +244,18 @@ class App:
         keydowns = pygame.event.get(KEYDOWN)
         keyups = pygame.event.get(KEYUP)
         mouse_events = pygame.event.get((MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEMOTION))
-
+        resets = pygame.event.get((RENDER_DEVICE_RESET, RENDER_TARGETS_RESET))
+        if resets:
+            self._canvas.clear()
+
+        events = [
+            PickableEvent.cast_from(event)
+            for event in chain(keydowns, keyups, mouse_events, resets)
+        ]
         self._event_q.put(
-            [
-                PickableEvent.cast_from(event)
-                for event in chain(keydowns, keyups, mouse_events)
-            ],
-            block=True,
+            (self.frame, events, self._evicted_hashes, self._profiler.enabled)
         )
+        self._evicted_hashes = []
 
         captured = list(filter(lambda event: bool(event.mod & KMOD_CTRL), keydowns))
         self._process_shortcuts(captured)
@@ -144,22 +267,91 @@ class App:
                     self.running = False
                 case pygame.K_s:
                     self._screenshot(self._get_screenshot_filename(self.frame - 1))
+                case pygame.K_p:
+                    self.show_overlay = not self.show_overlay
+                    self._overlay = None
+                    self._profiler.enabled = (
+                        self.show_overlay or self._current_project.config["profile"]
+                    )
+                case pygame.K_d:
+                    self.dump_profile()
 
     def stop(self):
         if self._callback_process:
-            self._callback_process.running = False
-            self._callback_process.join()
-
-    def _register_dots(self):
-        new_dots = self._data_q.get()
+            self._event_q.put(None)
+            self._callback_process.join(5.0)
+            # stuck on a full frame ring App no longer releases
+            if self._callback_process.is_alive():
+                self._callback_process.terminate()
+        if self._writer:
+            self._writer.close()
+        if self._recorder:
+            self._recorder.close()
+        if self._current_project.config["profile"]:
+            self.dump_profile()
+        if self._frame_ring:
+            self._frame_ring.close()
+            self._frame_ring.unlink()
+            self._frame_ring = None
+
+    def cache_stats(self) -> dict:
+        stats = self._cached_renders.stats()
+        stats["atlas_pages"] = self._atlas.page_count
+        stats["atlas_fill_ratio"] = self._atlas.fill_ratio
+        return stats
+
+    def export_stats(self) -> dict:
+        if self._recorder:
+            return self._recorder.stats()
+        return {"frames": self._writer.written, "queue_depth": self._writer.pending}
+
+    def profile_stats(self, last: int = 60) -> dict:
+        return self._profiler.averages(last)
+
+    def dump_profile(self, path: str | Path | None = None):
+        config = self._current_project.config
+        self._profiler.dump(path or config["out_dir"] / config["profile_file"])
+
+    def _merge_profile(self, data: tuple[int, dict]):
+        frame, timings = data
+        self._profiler.merge(frame, timings)
+
+    def _register_dots(self, new_dots: list[tuple[int, Dot]]):
         for hash_value, dot in new_dots:
-            tex = generate_dot_tex(dot, self._font_bank, self._renderer)
-            self._cached_renders[hash_value] = tex
-
-    def _get_blits(self):
+            surface = render_dot_surface(dot, self._font_bank)
+            self._retired.pop(hash_value, None)
+            self._atlas.remove(hash_value)
+            render = self._atlas.add(hash_value, surface)
+            width, height = surface.get_size()
+            self._cached_renders.put(hash_value, render, width * height * 4)
+
+    def _evict_renders(self):
+        self._cached_renders.tick()
+        # the callback learns about them with the next events, until then it
+        # may start frames up to this one + ahead using them
+        told, last_user = self.frame + 1, self.frame + self.ahead
+        for evicted_hash, render in self._cached_renders.pop_evicted():
+            self._retired[evicted_hash] = render, told, last_user
+            self._evicted_hashes.append(evicted_hash)
+        if self._retired:
+            released = [
+                hash_value
+                for hash_value, (_, told, last_user) in self._retired.items()
+                if told <= self._answered or last_user <= self.callback_frame
+            ]
+            for hash_value in released:
+                del self._retired[hash_value]
+                self._atlas.remove(hash_value)
+
+    def _lookup(self, hash_value: int) -> Image | None:
+        render = self._cached_renders.get(hash_value)
+        if render is None and hash_value in self._retired:
+            render = self._retired[hash_value][0]
+        return render
+
+    def _get_blits(self, data: list):
         blits = []
         try:
-            data = self._data_q.get()
             data_it = iter(data)
             blits = []
             while True:
@@ -168,19 +360,82 @@ class App:
                 length = next(data_it)
                 for _ in range(length):
                     hash_value = next(data_it)
-                    render = self._cached_renders.get(hash_value)
-                    blits.append((render, rect))
+                    render = self._lookup(hash_value)
+                    if render is not None:
+                        blits.append((render, rect))
         except (QueueEmpty, StopIteration):
             pass
         return blits
 
-    def _render(self):
-        blits = self._get_blits()
-        self._canvas.render_blocks(blits)
+    def _get_shared_blits(self, data: tuple[int, int]):
+        slot, count = data
+        cells = self._frame_ring.read(slot, count)
+        cell_rects = self._canvas.cell_rects
+        blits = []
+        i = 0
+        while i < count:
+            rect = cell_rects[cells[i]]
+            length = cells[i + 1]
+            i += 2
+            for hash_value in cells[i : i + length]:
+                render = self._lookup(hash_value)
+                if render is not None:
+                    blits.append((render, rect))
+            i += length
+        cells.release()
+        self._frame_ring.release(slot)
+        return blits
+
+    def _get_grid_blits(self, entry: tuple):
+        shape, depth, slot, data = entry
+        if slot is not None:
+            data = self._frame_ring.read_bytes(slot, data)
+        layers = np.frombuffer(data, LAYER_DTYPE).reshape(depth, shape[0] * shape[1])
+        if shape == self._canvas.shape:
+            cell_rects = self._canvas.cell_rects
+        else:
+            cell_rects = [
+                self._canvas.block_rect((x, y))
+                for y in range(shape[1])
+                for x in range(shape[0])
+            ]
+        blits = []
+        for layer in layers:
+            cells = np.flatnonzero(layer)
+            for cell, hash_value in zip(cells.tolist(), layer[cells].tolist()):
+                render = self._lookup(hash_value)
+                if render is not None:
+                    blits.append((render, cell_rects[cell]))
+        if slot is not None:
+            del layers
+            data.release()
+            self._frame_ring.release(slot)
+        return blits
+
+    def _render(self, data):
+        with self._profiler.stage("receive"):
+            blits = self._get_blits(data)
+        with self._profiler.stage("render_blocks"):
+            self._canvas.render_blocks(blits)
+
+    def _render_shared(self, data):
+        with self._profiler.stage("receive"):
+            blits = self._get_shared_blits(data)
+        with self._profiler.stage("render_blocks"):
+            self._canvas.render_blocks(blits)
+
+    def _render_grid(self, data):
+        with self._profiler.stage("receive"):
+            blits = self._get_grid_blits(data)
+        with self._profiler.stage("render_blocks"):
+            self._canvas.render_blocks(blits)
 
     def _clear(self):
         self._canvas.clear()
 
+    def _clear_blocks(self, positions: list[tuple[int, int]]):
+        self._canvas.clear_blocks(self._canvas.block_rect(pos) for pos in positions)
+
     def _canvas_rect(self):
         render_size = self._current_project.config["render_size"]
         full_res = self._canvas.full_res
@@ -193,47 +448,137 @@ class App:
         self._renderer.draw_color = self._current_project.config["backcolor"]
         self._renderer.clear()
         self._renderer.blit(self._canvas.render_tex, self._canvas_rect())
+        if self.show_overlay:
+            self._draw_overlay()
         self._renderer.present()
 
+    def _draw_overlay(self):
+        # redrawn twice a second, the averages change slowly
+        if self._overlay is None or self.frame % 15 == 0:
+            font = pygame.font.Font(None, 18)
+            lines = [f"frame {self.frame}"] + self._profiler.summary()
+            width = max(font.size(line)[0] for line in lines)
+            height = font.get_linesize()
+            surface = Surface((width + 8, height * len(lines) + 8))
+            for i, line in enumerate(lines):
+                text = font.render(line, True, (255, 255, 255))
+                surface.blit(text, (4, 4 + i * height))
+            self._overlay = Texture.from_surface(self._renderer, surface)
+        self._renderer.blit(self._overlay, self._overlay.get_rect())
+
+    def _receive(self, block: bool = True) -> tuple[int, ACTION_MSG, object]:
+        start = perf_counter()
+        frame, action = self._msg_q.get(block)
+        data = self._data_q.get() if action in DATA_MSGS else None
+        self._profiler.add("wait", perf_counter() - start)
+        return frame, action, data
+
+    def _handle(self, frame: int, action: ACTION_MSG, data, present: bool = True):
+        profiler = self._profiler
+        match action:
+            case ACTION_MSG.REGISTER_DOTS:
+                with profiler.stage("register_dots"):
+                    self._register_dots(data)
+            case ACTION_MSG.RENDER:
+                self._render(data)
+            case ACTION_MSG.RENDER_SHARED:
+                self._render_shared(data)
+            case ACTION_MSG.RENDER_GRID:
+                self._render_grid(data)
+            case ACTION_MSG.CLEAR:
+                with profiler.stage("clear"):
+                    self._clear()
+            case ACTION_MSG.CLEAR_BLOCKS:
+                with profiler.stage("clear"):
+                    self._clear_blocks(data)
+            case ACTION_MSG.UPDATE:
+                self.callback_frame = frame
+                self._answered = data
+                if present:
+                    with profiler.stage("present"):
+                        self._update_screen()
+            case ACTION_MSG.PROFILE:
+                self._merge_profile(data)
+            case ACTION_MSG.QUIT:
+                self.running = False
+
+    def _skip(self, action: ACTION_MSG, data):
+        # canvas work nobody sees, only gives back shared memory
+        if action == ACTION_MSG.RENDER_SHARED:
+            self._frame_ring.release(data[0])
+        elif action == ACTION_MSG.RENDER_GRID and data[2] is not None:
+            self._frame_ring.release(data[2])
+
     def _action_loop(self):
         while True:
-            action: ACTION_MSG = self._msg_q.get()
-            match action:
-                case ACTION_MSG.REGISTER_DOTS:
-                    self._register_dots()
-                case ACTION_MSG.RENDER:
-                    self._render()
-                case ACTION_MSG.CLEAR:
-                    self._clear()
-                case ACTION_MSG.UPDATE:
-                    self._update_screen()
-                    break
-                case ACTION_MSG.QUIT:
-                    self.running = False
-                    break
+            frame, action, data = self._receive()
+            self._handle(frame, action, data)
+            if action in (ACTION_MSG.UPDATE, ACTION_MSG.QUIT):
+                break
+
+    def _latest_loop(self):
+        while True:
+            try:
+                self._pending.append(self._receive(block=False))
+            except QueueEmpty:
+                break
+        ends = [
+            i
+            for i, (_, action, _) in enumerate(self._pending)
+            if action in (ACTION_MSG.UPDATE, ACTION_MSG.QUIT)
+        ]
+        if not ends:
+            # nothing new, keeps the window alive
+            with self._profiler.stage("present"):
+                self._update_screen()
+            return
+        complete = self._pending[: ends[-1] + 1]
+        self._pending = self._pending[ends[-1] + 1 :]
+        clears = [
+            i for i, (_, action, _) in enumerate(complete) if action == ACTION_MSG.CLEAR
+        ]
+        hidden_before = clears[-1] if clears else 0
+        for i, (frame, action, data) in enumerate(complete):
+            if i < hidden_before and action in CANVAS_MSGS:
+                self._skip(action, data)
+            else:
+                self._handle(frame, action, data, present=i == ends[-1])
 
     def _main_loop(self):
         self.running = True
         self.frame = 0
 
-        FPS = self._current_project.config["FPS"]
-        record = self._current_project.config["record"]
-        quit = self._current_project.config["quit"]
+        config = self._current_project.config
+        record = config["record"]
+        quit = config["quit"]
+        if self.render and quit < 0:
+            quit = record[1] - 1
+        FPS = config["FPS"] if not self.render or config["real_time"] else 0
 
+        profiler = self._profiler
         clock = Clock()
         clock.tick()
         while self.running:
-            self._window.title = f"{clock.get_fps():.2}"
-            self._process_events()
-
-            self._action_loop()
+            profiler.begin(self.frame)
+            self._window.title = f"{clock.get_fps():.1f}"
+            with profiler.stage("events"):
+                self._process_events()
+
+            if self.sync == "latest":
+                self._latest_loop()
+            else:
+                self._action_loop()
+            with profiler.stage("evict"):
+                self._evict_renders()
 
             should_record = record[0] <= self.frame < record[1]
             if should_record:
-                self._screenshot(self._get_screenshot_filename())
+                with profiler.stage("screenshot"):
+                    self._record()
 
             if quit >= 0 and self.frame >= quit:
                 self.running = False
 
             self.frame += 1
-            clock.tick(FPS)
+            with profiler.stage("tick"):
+                clock.tick(FPS)
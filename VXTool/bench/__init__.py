@@ -0,0 +1,34 @@
+import pickle
+from time import perf_counter
+from typing import Callable
+
+
+class SinkQueue:
+    """Stands in for a multiprocessing.Queue, pays only the pickling cost."""
+
+    def __init__(self):
+        self.puts: int = 0
+        self.bytes: int = 0
+
+    def put(self, obj, block=True, timeout=None):
+        self.puts += 1
+        self.bytes += len(pickle.dumps(obj))
+
+
+def measure(
+    func: Callable, repeat: int = 5, number: int = 1, setup: Callable | None = None
+) -> float:
+    """Best wall time of `repeat` runs of `number` calls, in seconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (perf_counter() - start) / number)
+    return best
+
+
+def report(name: str, seconds: float):
+    print(f"{name:<40} {seconds * 1e3:10.3f} ms")
@@ -0,0 +1,143 @@
+import random
+import sys
+
+from VXTool.animation import VectorAnimatedBuffer
+from VXTool.bench import measure, report
+from VXTool.core import AnimatedBuffer, AnimatedDot, AnimationProgram, Color, Dot
+
+FRAMES = 64
+SEEDS = range(20)
+DOT_COUNTS = [100, 1000, 10000]
+LETTERS = "ABCDEFGH"
+COLORS = [Color(255, 0, 0), Color(0, 255, 0), Color(0, 0, 255)]
+
+
+class Wobbling(AnimatedDot):
+    # interpreted by calling advance in both engines
+    def advance(self):
+        result = super().advance()
+        if self.frame_counter % 3 == 0:
+            self.new_pos = (self.pos[0], self.pos[1] + 1)
+        return result
+
+
+def example_program(buffer):
+    # the examples/animation pulse
+    base_dot = Dot(pos=(-1, -1), letter="█", color=Color(0, 0, 0), font_name="primary")
+    pulse = base_dot.variant(AnimatedDot, pos=(5, 5))
+    pulse.op_set(0, "letter", "ABCD")
+    pulse.op_move(1, (1, 0), 3)
+    pulse.op_move(4, (-3, 0))
+    pulse.op_jmp(4, 0)
+    buffer.put(pulse)
+    return buffer
+
+
+def random_dot(rng: random.Random, dot_class=AnimatedDot) -> AnimatedDot:
+    dot = dot_class(
+        pos=(rng.randrange(8), rng.randrange(8)),
+        letter=rng.choice(LETTERS),
+        color=rng.choice(COLORS),
+        font_name="primary",
+        clear=rng.random() < 0.5,
+    )
+    dot.op_set(0, "letter", rng.choice(LETTERS))
+    for _ in range(rng.randrange(1, 8)):
+        delta = rng.randrange(12)
+        match rng.randrange(6):
+            case 0:
+                dot.op_set(delta, "letter", "".join(rng.sample(LETTERS, 3)))
+            case 1:
+                dot.op_set(delta, "color", rng.sample(COLORS, 2))
+            case 2:
+                vector = rng.randrange(-1, 2), rng.randrange(-1, 2)
+                dot.op_move(delta, vector, rng.randrange(1, 4))
+            case 3:
+                dot.op_move_to(delta, (rng.randrange(8), rng.randrange(8)))
+            case 4:
+                # jumping back keeps the program from looping within a frame
+                dot.op_jmp(delta + 1, rng.randrange(delta + 1))
+            case 5:
+                if rng.random() < 0.3:
+                    dot.op_stop(delta + rng.randrange(20))
+    return dot
+
+
+def particles(buffer, count: int, programs: int = 32, size: int = 256):
+    # many dots sharing a few programs, spread over a large grid
+    rng = random.Random(0)
+    bases = [random_dot(rng) for _ in range(programs)]
+    for _ in range(count):
+        pos = rng.randrange(size), rng.randrange(size)
+        buffer.put(rng.choice(bases).variant(pos=pos))
+    return buffer
+
+
+def random_program(buffer, seed: int, count: int = 64):
+    rng = random.Random(seed)
+    first, second = (AnimationProgram(random_dot(rng).instructions) for _ in range(2))
+    programs = [first.loop(), first.concat(second), second.offset(3).loop()]
+    dots = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            dot = random_dot(rng).play(rng.choice(programs), rng.randrange(4))
+        elif dots and roll < 0.2:
+            # shares the instructions list
+            dot = rng.choice(dots).variant(pos=(rng.randrange(8), rng.randrange(8)))
+        elif roll < 0.25:
+            dot = random_dot(rng, Wobbling)
+        elif roll < 0.3:
+            dot = Dot(pos=(rng.randrange(8), rng.randrange(8)), letter="#")
+        else:
+            dot = random_dot(rng)
+        dots.append(dot)
+        buffer.put(dot)
+    return buffer
+
+
+def snapshot(buffer) -> list:
+    return [
+        (pos, [(dot.pos, dot.style.id, dot.clear) for dot in dots])
+        for pos, dots in buffer._container.items()
+    ]
+
+
+def same_output(program, *args) -> bool:
+    reference = program(AnimatedBuffer(), *args)
+    vectorized = program(VectorAnimatedBuffer(), *args)
+    for _ in range(FRAMES):
+        reference.advance()
+        vectorized.advance()
+        if snapshot(reference) != snapshot(vectorized):
+            return False
+    vectorized.sync()
+    return all(
+        (a.frame_counter, a.instruction_pointer)
+        == (b.frame_counter, b.instruction_pointer)
+        for a, b in zip(reference.animated_dots, vectorized.animated_dots)
+    )
+
+
+def main():
+    cases = [("examples/animation", example_program)]
+    cases += [(f"random program seed {seed}", random_program, seed) for seed in SEEDS]
+    failed = False
+    for name, program, *args in cases:
+        ok = same_output(program, *args)
+        failed = failed or not ok
+        print(f"{name:<40} {'ok' if ok else 'FAILED'}")
+
+    for count in DOT_COUNTS:
+        for buffer_class in (AnimatedBuffer, VectorAnimatedBuffer):
+            buffer = particles(buffer_class(), count)
+            buffer.advance()
+            report(
+                f"{buffer_class.__name__} {count} dots advance",
+                measure(buffer.advance, repeat=3, number=10),
+            )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
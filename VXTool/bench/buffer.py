@@ -0,0 +1,60 @@
+from VXTool.bench import SinkQueue, measure, report
+from VXTool.callback import CallbackProcess
+from VXTool.core import Buffer, Color, Dot
+from VXTool.grid import GridBuffer
+
+SHAPES = [(16, 8), (64, 64), (128, 128)]
+LAYERS = 4
+COLORS = [Color(255, 255, 255), Color(255, 0, 0), Color(0, 255, 0), Color(0, 0, 255)]
+
+
+def layer_dots(shape: tuple[int, int], layers: int = LAYERS) -> list[Dot]:
+    base = Dot(letter="█", color=COLORS[0], font_name="primary", clear=False)
+    return [
+        base.variant(pos=(x, y), letter=chr(65 + layer), color=COLORS[layer % 4])
+        for y in range(shape[1])
+        for x in range(shape[0])
+        for layer in range(layers)
+    ]
+
+
+def make_buffers(shape: tuple[int, int]):
+    return {
+        "Buffer": lambda: Buffer(),
+        "GridBuffer": lambda: GridBuffer(shape, LAYERS),
+    }
+
+
+def make_callback() -> CallbackProcess:
+    return CallbackProcess(SinkQueue(), SinkQueue(), SinkQueue())
+
+
+def main():
+    for shape in SHAPES:
+        dots = layer_dots(shape)
+        half = len(dots) // 2
+        for name, factory in make_buffers(shape).items():
+            label = f"{name} {shape[0]}x{shape[1]}x{LAYERS}"
+            buffer = factory()
+            report(
+                f"{label} put", measure(lambda: buffer.extend(dots), setup=buffer.clear)
+            )
+
+            other = factory()
+            other.extend(dots[half:])
+
+            def reset():
+                buffer.clear()
+                buffer.extend(dots[:half])
+
+            report(f"{label} merge", measure(lambda: buffer.merge(other), setup=reset))
+
+            buffer.clear()
+            buffer.extend(dots)
+            callback = make_callback()
+            callback.draw(buffer)
+            report(f"{label} draw", measure(lambda: callback.draw(buffer)))
+
+
+if __name__ == "__main__":
+    main()
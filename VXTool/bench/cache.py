@@ -0,0 +1,98 @@
+import os
+import sys
+from copy import deepcopy
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from VXTool.app import App
+from VXTool.callback import CallbackProcess
+from VXTool.core import Buffer, Color, Dot
+from VXTool.font import FontInfo
+from VXTool.project import CONFIG_DEFAULTS, ProjectContext
+
+FONT_PATH = Path(__file__).parent.parent.parent / "VXTool_template" / "UniVGA16.ttf"
+FRAMES = 24
+
+
+class StaticAndCycling(CallbackProcess):
+    # five glyphs that never change and one cell cycling through eight letters
+    def setup(self):
+        self.base_dot = Dot(letter="#", color=Color(255, 0, 0), font_name="primary")
+        self.screen = Buffer()
+
+    def update(self):
+        self.clear()
+        self.screen.clear()
+        for x, letter in enumerate("VWXYZ"):
+            self.screen.put(self.base_dot.variant(pos=(x, 0), letter=letter))
+        letter = "ABCDEFGH"[self.updates_count % 8]
+        self.screen.put(self.base_dot.variant(pos=(5, 0), letter=letter))
+        self.draw(self.screen)
+        self.present()
+
+
+class ReturningCell(CallbackProcess):
+    # second cell goes back to its first hash in the same frame the first
+    # cell registers a new one, then stays, so diff mode never resends it
+    def setup(self):
+        self.base_dot = Dot(letter="#", color=Color(0, 255, 0), font_name="primary")
+        self.screen = Buffer()
+
+    def update(self):
+        frame = min(self.updates_count, 2)
+        self.clear()
+        self.screen.clear()
+        self.screen.put(self.base_dot.variant(pos=(0, 0), letter="AAB"[frame]))
+        self.screen.put(self.base_dot.variant(pos=(1, 0), letter="XYX"[frame]))
+        self.draw(self.screen)
+        self.present()
+
+
+def render_last_frame(callback_class, out_dir: Path, **config) -> bytes:
+    project_config = deepcopy(CONFIG_DEFAULTS)
+    project_config.update(
+        project_dir=out_dir, out_dir=out_dir, quit=FRAMES, FPS=1000, **config
+    )
+    project = ProjectContext(
+        SimpleNamespace(Callback=callback_class),
+        project_config,
+        [FontInfo(FONT_PATH, 16, "primary")],
+    )
+    app = App()
+    app.run(project)
+    app._renderer.target = app._canvas.render_tex
+    return pygame.image.tostring(app._renderer.to_surface(), "RGBA")
+
+
+def main():
+    cases = [
+        ("static glyphs with a small budget", StaticAndCycling, {}, 5),
+        (
+            "diff mode cell returning to an evicted hash",
+            ReturningCell,
+            {"diff": True},
+            2,
+        ),
+    ]
+    failed = False
+    with TemporaryDirectory() as out_dir:
+        for name, callback_class, config, max_entries in cases:
+            expected = render_last_frame(
+                callback_class, Path(out_dir), cache_max_entries=None, **config
+            )
+            result = render_last_frame(
+                callback_class, Path(out_dir), cache_max_entries=max_entries, **config
+            )
+            ok = result == expected
+            failed = failed or not ok
+            print(f"{name:<50} {'ok' if ok else 'FAILED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
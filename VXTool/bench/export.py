@@ -0,0 +1,148 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import pygame
+
+from VXTool.export import FFmpegRecorder, FrameWriter
+
+FRAMES = 48
+SIZE = (720, 720)
+# the pipe case runs when ffmpeg is on PATH or FFMPEG points at it
+FFMPEG = os.environ.get("FFMPEG") or shutil.which("ffmpeg")
+FONT_PATH = Path(__file__).parent.parent.parent / "VXTool_template" / "UniVGA16.ttf"
+
+
+def make_frames() -> list[pygame.Surface]:
+    # grids of colored letters, shifted every frame
+    font = pygame.font.Font(FONT_PATH, 32)
+    frames = []
+    for i in range(FRAMES):
+        surface = pygame.Surface(SIZE)
+        surface.fill((255, 255, 255))
+        for y in range(0, SIZE[1], 32):
+            for x in range(0, SIZE[0], 16):
+                letter = chr(65 + (x // 16 + y // 32 + i) % 26)
+                color = ((x * 7) % 256, (y * 5) % 256, (i * 11) % 256)
+                surface.blit(font.render(letter, False, color), (x, y))
+        frames.append(surface)
+    return frames
+
+
+def run_sync(frames, out_dir: Path) -> tuple[float, float]:
+    start = perf_counter()
+    for i, frame in enumerate(frames):
+        pygame.image.save(frame, str(out_dir / f"frame_{i:0>5}.png"))
+    elapsed = perf_counter() - start
+    return elapsed, elapsed
+
+
+def run_writer(frames, out_dir: Path, **kwargs) -> tuple[float, float]:
+    writer = FrameWriter(**kwargs)
+    blocked = 0.0
+    start = perf_counter()
+    for i, frame in enumerate(frames):
+        write_start = perf_counter()
+        writer.write(out_dir / f"frame_{i:0>5}{writer.suffix}", frame)
+        blocked += perf_counter() - write_start
+    writer.close()
+    return blocked, perf_counter() - start
+
+
+def run_ffmpeg(frames, out_dir: Path) -> tuple[float, float, dict]:
+    recorder = FFmpegRecorder(out_dir / "movie.mp4", 30, ffmpeg=FFMPEG)
+    blocked = 0.0
+    start = perf_counter()
+    for frame in frames:
+        write_start = perf_counter()
+        recorder.write(frame)
+        blocked += perf_counter() - write_start
+    recorder.close()
+    return blocked, perf_counter() - start, recorder.stats()
+
+
+def run_stitch(frames, out_dir: Path) -> tuple[float, float]:
+    # the --movie path: ppm files first, then ffmpeg reads them back
+    blocked, _ = run_writer(frames, out_dir, format="ppm")
+    start = perf_counter()
+    subprocess.run(
+        [FFMPEG, "-loglevel", "error", "-framerate", "30"]
+        + ["-i", str(out_dir / "frame_%05d.ppm"), str(out_dir / "movie.mp4")],
+        check=True,
+    )
+    return blocked, blocked + perf_counter() - start
+
+
+def movie_frames(path: Path) -> int:
+    result = subprocess.run(
+        [FFMPEG, "-v", "error", "-i", str(path), "-f", "rawvideo"]
+        + ["-pix_fmt", "rgb24", "-"],
+        capture_output=True,
+        check=True,
+    )
+    return len(result.stdout) // (SIZE[0] * SIZE[1] * 3)
+
+
+def same_pixels(frame: pygame.Surface, path: Path) -> bool:
+    loaded = pygame.image.load(str(path))
+    return pygame.image.tobytes(loaded, "RGB") == pygame.image.tobytes(frame, "RGB")
+
+
+def main():
+    pygame.init()
+    frames = make_frames()
+    workers = os.cpu_count()
+    cases = [("synchronous image.save", run_sync, {})]
+    cases += [
+        (
+            f"png level {level}, {n} workers",
+            run_writer,
+            dict(png_level=level, workers=n),
+        )
+        for level in (1, 6)
+        for n in sorted({1, workers})
+    ]
+    cases += [
+        (f"ppm, {n} workers", run_writer, dict(format="ppm", workers=n))
+        for n in sorted({1, workers})
+    ]
+    failed = False
+    print(f"{FRAMES} frames {SIZE[0]}x{SIZE[1]}, main loop ms/frame, total ms/frame")
+    for name, run, kwargs in cases:
+        with TemporaryDirectory() as out_dir:
+            out_dir = Path(out_dir)
+            blocked, total = run(frames, out_dir, **kwargs)
+            size = sum(path.stat().st_size for path in out_dir.iterdir()) / FRAMES
+            ok = all(
+                same_pixels(frame, path)
+                for frame, path in zip(frames, sorted(out_dir.iterdir()))
+            )
+        failed = failed or not ok
+        print(
+            f"{name:<30} {blocked / FRAMES * 1e3:8.2f} {total / FRAMES * 1e3:8.2f}"
+            f" {size / 1024:8.1f} KiB {'ok' if ok else 'FAILED'}"
+        )
+    if FFMPEG is None:
+        print("ffmpeg not found, set FFMPEG to compare the pipe")
+        sys.exit(1 if failed else 0)
+    for name, run in (("ppm files + stitch", run_stitch), ("ffmpeg pipe", run_ffmpeg)):
+        with TemporaryDirectory() as out_dir:
+            out_dir = Path(out_dir)
+            blocked, total, *stats = run(frames, out_dir)
+            ok = movie_frames(out_dir / "movie.mp4") == FRAMES
+        failed = failed or not ok
+        print(
+            f"{name:<30} {blocked / FRAMES * 1e3:8.2f} {total / FRAMES * 1e3:8.2f}"
+            f" {'ok' if ok else 'FAILED'}"
+        )
+        if stats:
+            print(", ".join(f"{key} {value:.4g}" for key, value in stats[0].items()))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import gc
+import tracemalloc
+
+from VXTool.core import (
+    AnimatedBuffer,
+    AnimatedDot,
+    AnimationProgram,
+    Buffer,
+    Color,
+    Dot,
+)
+
+COUNT = 100_000
+WIDTH = 320
+
+
+def fill(buffer: Buffer, base: Dot, count: int = COUNT, **kwargs) -> Buffer:
+    for i in range(count):
+        buffer.put(base.variant(pos=(i % WIDTH, i // WIDTH), **kwargs))
+    return buffer
+
+
+def animated_base() -> AnimatedDot:
+    dot = AnimatedDot(letter="#", color=Color(255, 0, 0), font_name="primary")
+    dot.op_move(1, (1, 0), repeat=4)
+    dot.op_jmp(4, 0)
+    return dot
+
+
+def bytes_per_dot(make_buffer) -> float:
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    buffer = make_buffer()
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del buffer
+    return (end - start) / COUNT
+
+
+def main():
+    base = Dot(letter="#", color=Color(255, 0, 0), font_name="primary")
+    cases = {
+        "Buffer of Dot": lambda: fill(Buffer(), base),
+        "AnimatedBuffer of AnimatedDot": lambda: fill(
+            AnimatedBuffer(), animated_base()
+        ),
+        "AnimatedDot deep copies": lambda: fill(
+            AnimatedBuffer(), animated_base(), option="deep"
+        ),
+        "AnimatedDot playing a program": lambda: fill(
+            AnimatedBuffer(),
+            animated_base().play(AnimationProgram(animated_base().instructions)),
+        ),
+    }
+    for name, make_buffer in cases.items():
+        print(f"{name + f' x{COUNT}':<40} {bytes_per_dot(make_buffer):10.1f} B/dot")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+from copy import deepcopy
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Iterator, NamedTuple
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from VXTool.animation import VectorAnimatedBuffer
+from VXTool.app import App
+from VXTool.bench import measure
+from VXTool.bench.animation import particles
+from VXTool.bench.buffer import COLORS, layer_dots, make_callback
+from VXTool.core import AnimatedBuffer, Buffer, Dot
+from VXTool.font import FontBank, FontInfo
+from VXTool.grid import GridBuffer
+from VXTool.project import CONFIG_DEFAULTS, ProjectContext
+from VXTool.render import Canvas, generate_dot_tex
+
+ROOT = Path(__file__).parent.parent.parent
+FONT_PATH = ROOT / "VXTool_template" / "UniVGA16.ttf"
+EXAMPLES_DIR = ROOT / "examples"
+SHAPES = [(16, 8), (64, 64), (128, 128)]
+DEPTHS = [1, 4]
+DOT_COUNTS = [100, 1000, 10000]
+STRESS_FRAMES = 10
+
+
+class Case(NamedTuple):
+    """A benchmark, `run` does its own setup and returns the result in `unit`,
+    seconds per call are better lower, frames per second higher."""
+
+    name: str
+    run: Callable[[], float]
+    unit: str = "s"
+
+
+def buffer_case(name: str, factory, shape: tuple[int, int], depth: int, op: str):
+    def run():
+        dots = layer_dots(shape, depth)
+        buffer = factory()
+        match op:
+            case "put":
+
+                def put():
+                    for dot in dots:
+                        buffer.put(dot)
+
+                return measure(put, setup=buffer.clear)
+            case "extend":
+                return measure(lambda: buffer.extend(dots), setup=buffer.clear)
+            case "merge":
+                other = factory()
+                other.extend(dots[len(dots) // 2 :])
+
+                def reset():
+                    buffer.clear()
+                    buffer.extend(dots[: len(dots) // 2])
+
+                return measure(lambda: buffer.merge(other), setup=reset)
+            case "draw":
+                buffer.extend(dots)
+                callback = make_callback()
+                callback.draw(buffer)
+                return measure(lambda: callback.draw(buffer))
+
+    label = f"{name}.{shape[0]}x{shape[1]}x{depth}"
+    if op == "draw":
+        return Case(f"callback.draw.{label}", run)
+    return Case(f"buffer.{label}.{op}", run)
+
+
+def buffer_cases(shape: tuple[int, int], depth: int) -> Iterator[Case]:
+    factories = {"Buffer": Buffer, "GridBuffer": lambda: GridBuffer(shape, depth)}
+    for name, factory in factories.items():
+        for op in ("put", "extend", "merge", "draw"):
+            yield buffer_case(name, factory, shape, depth, op)
+
+
+def advance_case(buffer_class, count: int) -> Case:
+    def run():
+        buffer = particles(buffer_class(), count)
+        buffer.advance()
+        return measure(buffer.advance, repeat=5, number=10)
+
+    return Case(f"animation.advance.{buffer_class.__name__}.{count}", run)
+
+
+def make_app(shape: tuple[int, int], full_res: tuple[int, int] = (720, 720)) -> App:
+    app = App()
+    app._canvas = Canvas(shape, full_res, COLORS[0], app._renderer)
+    return app
+
+
+def decode_cases(shape: tuple[int, int], depth: int) -> Iterator[Case]:
+    # stands in for registered textures, decoding only looks them up
+    label = f"{shape[0]}x{shape[1]}x{depth}"
+    dots = layer_dots(shape, depth)
+
+    def get_blits():
+        app = make_app(shape)
+        hashes = [hash(dot) for dot in dots[:depth]]
+        entry = []
+        for x in range(shape[0]):
+            for y in range(shape[1]):
+                entry += [(x, y), depth, *hashes]
+        for hash_value in hashes:
+            app._cached_renders.put(hash_value, object(), 0)
+        return measure(lambda: app._get_blits(entry))
+
+    def get_grid_blits():
+        app = make_app(shape)
+        grid = GridBuffer(shape, depth)
+        grid.extend(dots)
+        for style_id in np.unique(grid._layers).tolist():
+            app._cached_renders.put(style_id, object(), 0)
+        data = grid._layers.tobytes()
+        entry = shape, depth, None, data
+        return measure(lambda: app._get_grid_blits(entry))
+
+    yield Case(f"app.get_blits.{label}", get_blits)
+    yield Case(f"app.get_grid_blits.{label}", get_grid_blits)
+
+
+def generate_dot_tex_case(count: int = 256) -> Case:
+    def run():
+        app = make_app((16, 8))
+        font_bank = FontBank()
+        font_bank.load(FontInfo(FONT_PATH, 16, "primary"))
+        base = Dot(font_name="primary")
+        dots = [
+            base.variant(letter=chr(33 + i % 94), color=COLORS[i % len(COLORS)])
+            for i in range(count)
+        ]
+
+        def generate():
+            for dot in dots:
+                generate_dot_tex(dot, font_bank, app._renderer)
+
+        return measure(generate) / count
+
+    return Case(f"render.generate_dot_tex.{count}", run)
+
+
+def stress_case(frames: int = STRESS_FRAMES) -> Case:
+    # examples/stress end to end, both processes, the renderer and queues
+    def run():
+        sys.path.append(str(EXAMPLES_DIR))
+        callback_module = importlib.import_module("stress.callback")
+        settings = importlib.import_module("stress.settings")
+        with TemporaryDirectory() as out_dir:
+            config = deepcopy(CONFIG_DEFAULTS)
+            config.update(settings.CONFIG)
+            config.update(out_dir=Path(out_dir), quit=frames - 1, FPS=1000)
+            project = ProjectContext(callback_module, config, settings.FONTS)
+            app = App()
+            start = perf_counter()
+            app.run(project)
+            return frames / (perf_counter() - start)
+
+    return Case(f"stress.fps.{frames}", run, "fps")
+
+
+def cases() -> Iterator[Case]:
+    for shape in SHAPES:
+        for depth in DEPTHS:
+            yield from buffer_cases(shape, depth)
+    for count in DOT_COUNTS:
+        for buffer_class in (AnimatedBuffer, VectorAnimatedBuffer):
+            yield advance_case(buffer_class, count)
+    for shape in SHAPES:
+        yield from decode_cases(shape, 4)
+    yield generate_dot_tex_case()
+    # last, it runs a whole App
+    yield stress_case()
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def regression(value: float, baseline: float, unit: str, threshold: float) -> bool:
+    if unit == "fps":
+        return value < baseline / (1 + threshold)
+    return value > baseline * (1 + threshold)
+
+
+def format_value(value: float, unit: str) -> str:
+    if unit == "fps":
+        return f"{value:10.2f} fps"
+    return f"{value * 1e3:10.3f} ms "
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m VXTool.bench")
+    parser.add_argument("-k", "--filter", default="", help="run cases containing it")
+    parser.add_argument("-o", "--out", type=Path, help="write results as JSON")
+    parser.add_argument(
+        "-c", "--compare", type=Path, help="baseline JSON to flag regressions against"
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative slowdown counted as a regression, 0.1 by default",
+    )
+    parser.add_argument("-l", "--list", action="store_true", help="list case names")
+    args = parser.parse_args(argv)
+
+    selected = [case for case in cases() if args.filter in case.name]
+    if args.list:
+        print("\n".join(case.name for case in selected))
+        return
+
+    baseline = dict()
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["results"]
+
+    pygame.init()
+    results = dict()
+    regressions = []
+    for case in selected:
+        value = case.run()
+        results[case.name] = {"value": value, "unit": case.unit}
+        line = f"{case.name:<48} {format_value(value, case.unit)}"
+        if case.name in baseline:
+            base_value = baseline[case.name]["value"]
+            change = value / base_value - 1
+            line += f" {change:+8.1%}"
+            if regression(value, base_value, case.unit, args.threshold):
+                regressions.append(case.name)
+                line += " REGRESSION"
+        print(line, flush=True)
+
+    if args.out:
+        args.out.write_text(
+            json.dumps({"environment": environment(), "results": results}, indent=2)
+        )
+    if regressions:
+        print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+        sys.exit(1)
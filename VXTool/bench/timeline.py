@@ -0,0 +1,186 @@
+import random
+import sys
+
+from VXTool.animation import VectorAnimatedBuffer
+from VXTool.bench import measure, report
+from VXTool.core import (
+    ANIMATION_OP,
+    AnimatedBuffer,
+    AnimatedDot,
+    AnimationOp,
+    AnimationProgram,
+    Timeline,
+)
+from VXTool.util.animation import spell_and_stop
+
+OPS = 10_000
+
+
+def letters_dot(ops: list[tuple[int, str]], jmp: tuple[int, int]) -> AnimatedDot:
+    dot = AnimatedDot(pos=(0, 0), letter="-")
+    for counter, letter in ops:
+        dot.op_set(counter, "letter", letter)
+    dot.op_jmp(*jmp)
+    return dot
+
+
+# ops, JMP (at, to), letters after each advance
+JMP_CASES = {
+    "jump lands between ops": (
+        [(0, "A"), (2, "B"), (5, "C")],
+        (6, 3),
+        "AABBBCCCCC",
+    ),
+    "jump lands on an op": (
+        [(0, "A"), (2, "B"), (4, "C")],
+        (5, 2),
+        "AABBCBBCB",
+    ),
+    "jump past the last op": (
+        [(0, "A"), (1, "B")],
+        (2, 10),
+        "ABBBBB",
+    ),
+    "jump before the first op": (
+        [(2, "B"), (3, "C")],
+        (4, 0),
+        "--BCCCBCCC",
+    ),
+}
+
+
+def spell(dot: AnimatedDot, text: str):
+    dot.op_set(0, "letter", text)
+
+
+AB = AnimationProgram.record(spell, "AB")
+XY = AnimationProgram.record(spell, "XY")
+
+# program, delay, letters after each advance
+PROGRAM_CASES = {
+    "concat and loop": (AB.concat(XY).loop(), 1, "-ABXYABXY"),
+    "offset": (AB.offset(2), 0, "--ABBB"),
+    "loop after offset": (AB.offset(1).loop(), 0, "-ABBAB"),
+    "recorded stop": (AnimationProgram.record(spell_and_stop, text="AB"), 0, "AB"),
+}
+
+
+def letters(buffer_class, dot: AnimatedDot, frames: int) -> str:
+    buffer = buffer_class()
+    buffer.put(dot)
+    text = ""
+    for _ in range(frames):
+        buffer.advance()
+        text += dot.letter
+    return text
+
+
+def jmp_letters(buffer_class, ops, jmp, frames: int) -> str:
+    return letters(buffer_class, letters_dot(ops, jmp), frames)
+
+
+def program_letters(buffer_class, program, delay: int, frames: int) -> str:
+    dot = AnimatedDot(pos=(0, 0), letter="-").play(program, delay)
+    return letters(buffer_class, dot, frames)
+
+
+def copy_on_write() -> bool:
+    program = AB.loop()
+    ops = program.ops
+    dot = AnimatedDot(pos=(0, 0), letter="-").play(program, 3)
+    other = dot.variant()
+    dot.op_set(1, "letter", "Z")
+    return (
+        program.ops == ops
+        and other.instructions is program
+        and [op.counter for op in dot.instructions] == [1, 3, 4, 5]
+    )
+
+
+def op_order() -> bool:
+    def op(counter, letter):
+        return AnimationOp(counter, ANIMATION_OP.SET, ("letter", letter))
+
+    timeline = Timeline()
+    timeline.add(op(1, "X"))
+    timeline.add_ops([op(1, "Y"), op(0, "Z")])
+    timeline.add(op(1, "W"))
+    merged = Timeline([op(1, "X"), op(3, "W")])
+    merged.add_ops([op(2, "Z"), op(1, "Y")])
+    return [o.args[1] for o in timeline] == list("ZXYW") and [
+        o.args[1] for o in merged
+    ] == list("XYZW")
+
+
+def linear_add_op(instructions: list, new_op: AnimationOp):
+    # insertion before Timeline, for comparison
+    idx = 0
+    for op in instructions:
+        if new_op.counter >= op.counter:
+            idx += 1
+        else:
+            break
+    instructions.insert(idx, new_op)
+
+
+def main():
+    failed = False
+    for name, (ops, jmp, expected) in JMP_CASES.items():
+        for buffer_class in (AnimatedBuffer, VectorAnimatedBuffer):
+            ok = jmp_letters(buffer_class, ops, jmp, len(expected)) == expected
+            failed = failed or not ok
+            label = f"{buffer_class.__name__} {name}"
+            print(f"{label:<50} {'ok' if ok else 'FAILED'}")
+    for name, (program, delay, expected) in PROGRAM_CASES.items():
+        for buffer_class in (AnimatedBuffer, VectorAnimatedBuffer):
+            result = program_letters(buffer_class, program, delay, len(expected))
+            ok = result == expected
+            failed = failed or not ok
+            label = f"{buffer_class.__name__} {name}"
+            print(f"{label:<50} {'ok' if ok else 'FAILED'}")
+    for name, check in (
+        ("ops at one counter keep add order", op_order),
+        ("ops added to a playing dot copy the program", copy_on_write),
+    ):
+        ok = check()
+        failed = failed or not ok
+        print(f"{name:<50} {'ok' if ok else 'FAILED'}")
+
+    rng = random.Random(0)
+    ops = [
+        AnimationOp(rng.randrange(OPS), ANIMATION_OP.MOVE, ((1, 0),))
+        for _ in range(OPS)
+    ]
+
+    def build_linear():
+        instructions = []
+        for op in ops:
+            linear_add_op(instructions, op)
+
+    def build_add():
+        timeline = Timeline()
+        for op in ops:
+            timeline.add(op)
+
+    report(f"linear insert {OPS} ops", measure(build_linear, repeat=1))
+    report(f"Timeline.add {OPS} ops", measure(build_add))
+    report(f"Timeline.add_ops {OPS} ops", measure(lambda: Timeline().add_ops(ops)))
+
+    dot = AnimatedDot()
+    report(
+        f"op_move repeat={OPS}",
+        measure(lambda: dot.op_move(0, (1, 0), OPS), setup=dot.clear_state),
+    )
+
+    timeline = Timeline()
+    timeline.add_ops(ops)
+    targets = [rng.randrange(OPS) for _ in range(1000)]
+    report(
+        f"1000 jump lookups in {OPS} ops",
+        measure(lambda: [timeline.find(target) for target in targets]),
+    )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """Mapping bounded by entry count and estimated bytes.
+
+    The owner calls `tick` once per frame, after the frame is presented.
+    It evicts least recently used entries until the cache is back within
+    budget and starts a new generation. Entries used during the generation
+    that just ended are never evicted, so a working set larger than the
+    budget overshoots it instead of thrashing. `put` never evicts, lookups
+    of the frame being decoded always find what was registered for it.
+    """
+
+    def __init__(self, max_entries: int | None = None, max_bytes: int | None = None):
+        self.max_entries: int | None = max_entries
+        self.max_bytes: int | None = max_bytes
+        self._entries: OrderedDict[Hashable, list] = OrderedDict()
+        self._evicted: list[tuple[Hashable, Any]] = []
+        self.generation: int = 0
+        self.bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        entry[2] = self.generation
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value, size: int = 0):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._entries[key] = [value, size, self.generation]
+        self.bytes += size
+
+    def _over_budget(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.bytes > self.max_bytes
+
+    def _evict(self):
+        while self._over_budget():
+            key, (value, size, generation) = next(iter(self._entries.items()))
+            if generation >= self.generation:
+                break
+            del self._entries[key]
+            self.bytes -= size
+            self.evictions += 1
+            self._evicted.append((key, value))
+
+    def pop_evicted(self) -> list[tuple[Hashable, Any]]:
+        evicted = self._evicted
+        self._evicted = []
+        return evicted
+
+    def tick(self):
+        self._evict()
+        self.generation += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,13 +1,26 @@
 import re
 from multiprocessing import Process, Queue
 from queue import Empty as QueueEmpty
+from time import perf_counter
 from typing import Callable
 
-from pygame import KEYDOWN, KEYUP, MOUSEBUTTONDOWN, MOUSEBUTTONUP, MOUSEMOTION
+import numpy as np
+from pygame import (
+    KEYDOWN,
+    KEYUP,
+    MOUSEBUTTONDOWN,
+    MOUSEBUTTONUP,
+    MOUSEMOTION,
+    RENDER_DEVICE_RESET,
+    RENDER_TARGETS_RESET,
+)
 from pygame.key import name as key_name
 
-from VXTool.app import ACTION_MSG, PickableEvent
+from VXTool.app import ACTION_MSG, DATA_MSGS, PickableEvent
 from VXTool.core import Buffer, Dot
+from VXTool.grid import EMPTY, GridBuffer
+from VXTool.profiling import FrameProfiler
+from VXTool.transport import SharedFrameRing
 
 
 class CallbackProcess(Process):
@@ -15,30 +28,56 @@ class CallbackProcess(Process):
         pattern=r"^on_(?P<name>[a-z0-9]+)(?:_{1}(?P<attr>\w+))*$", flags=re.IGNORECASE
     )
 
-    def __init__(self, msg_q: Queue, data_q: Queue, event_q: Queue):
+    def __init__(
+        self,
+        msg_q: Queue,
+        data_q: Queue,
+        event_q: Queue,
+        frame_ring: SharedFrameRing | None = None,
+        diff: bool = False,
+        ahead: int = 0,
+    ):
         super().__init__()
         self._msg_q: Queue = msg_q
         self._data_q: Queue = data_q
         self._event_q: Queue = event_q
+        self._frame_ring: SharedFrameRing | None = frame_ring
         self.updates_count: int = 0
+        # frames it may run ahead of App, newest App frame seen
+        self.ahead: int = ahead
+        self.app_frame: int = -1
 
         self._event_handlers: dict[str, Callable] = dict()
         self._prepare_event_handlers()
 
         self._registered_hashes: set[int] = set()
 
+        self.diff: bool = diff
+        self._last_frame: dict[tuple[int, int], list[int]] = dict()
+        self._pending_frame: dict[tuple[int, int], list[int]] | None = None
+
+        # the last finished update is sent to App with the next present
+        self._profiler = FrameProfiler("callback", history=2)
+
         self.running = False
 
     def run(self):
-        self.setup()
-        self.running = True
-        while self.running:
-            try:
-                self._dispatch_events(True, 1.0)
-                self.update()
+        try:
+            self.setup()
+            self.running = True
+            while self._dispatch_events():
+                if not self.running:
+                    continue
+                with self._profiler.stage("update"):
+                    self.update()
                 self.updates_count += 1
-            except QueueEmpty:
-                break
+        except BaseException:
+            # App would wait for frames that never come
+            self.quit()
+            raise
+        # App no longer reads what is still buffered
+        self._msg_q.cancel_join_thread()
+        self._data_q.cancel_join_thread()
 
     def _prepare_event_handlers(self):
         for key in dir(self):
@@ -53,10 +92,37 @@ class CallbackProcess(Process):
             attr = "" if attr is None else attr
             attr = attr.upper()
             self._event_handlers[(name, attr)] = value
-        print(self._event_handlers.keys())
 
-    def _dispatch_events(self, block=True, timeout=None):
-        events: list[PickableEvent] = self._event_q.get(block, timeout)
+    def _dispatch_events(self) -> bool:
+        """Handles the event batches App has sent, False once App stops.
+
+        Waits until App is at most `ahead` frames behind the next update,
+        after quit until App stops.
+        """
+        start = perf_counter()
+        batches = []
+        while True:
+            wait = not self.running or self.app_frame < self.updates_count - self.ahead
+            try:
+                batch = self._event_q.get(wait)
+            except QueueEmpty:
+                break
+            if batch is None:
+                return False
+            self.app_frame = batch[0]
+            if self.running:
+                batches.append(batch)
+        if batches:
+            self._profiler.enabled = batches[-1][3]
+        self._profiler.begin(self.updates_count)
+        self._profiler.add("wait", perf_counter() - start)
+        with self._profiler.stage("events"):
+            for _, events, evicted_hashes, _ in batches:
+                self._handle_events(events, evicted_hashes)
+        return True
+
+    def _handle_events(self, events: list[PickableEvent], evicted_hashes: list[int]):
+        self._registered_hashes.difference_update(evicted_hashes)
         for event in events:
             handler = None
             name = event.type_name.upper()
@@ -68,41 +134,152 @@ class CallbackProcess(Process):
                 attr = str(event.attrs["button"])
             elif event.type == MOUSEMOTION:
                 attr = ""
+            elif event.type in (RENDER_DEVICE_RESET, RENDER_TARGETS_RESET):
+                # App's canvas has been cleared, next diff resends everything
+                self._last_frame = dict()
             handler = self._event_handlers.get((name, attr), None)
             if handler is None:
                 handler = self._event_handlers.get((name, ""), None)
             if handler is not None:
                 handler(event.attrs)
 
-    def draw(self, buffer: Buffer):
-        entry = []
+    def _post(self, action: ACTION_MSG, data=None):
+        self._msg_q.put((self.updates_count, action))
+        if action in DATA_MSGS:
+            self._data_q.put(data)
+
+    def _register(self, dot: Dot, hash_value: int, new_dots: list):
+        plain_dot = dot.variant(Dot) if dot.__class__ != Dot else dot
+        new_dots.append((hash_value, plain_dot))
+        self._registered_hashes.add(hash_value)
+
+    def _collect(self, buffer: Buffer) -> list[tuple[tuple[int, int], list[int]]]:
+        stacks = []
         new_dots = []
         for pos, dots in buffer._container.items():
-            entry.append(pos)
-            entry.append(len(dots))
+            if not dots:
+                continue
+            hashes = []
             for dot in dots:
                 hash_value = hash(dot)
                 if hash_value not in self._registered_hashes:
-                    plain_dot = dot.variant(Dot) if dot.__class__ != Dot else dot
-                    new_dots.append((hash_value, plain_dot))
-                    self._registered_hashes.add(hash_value)
-                entry.append(hash_value)
+                    self._register(dot, hash_value, new_dots)
+                hashes.append(hash_value)
+            stacks.append((pos, hashes))
+
+        if len(new_dots) > 0:
+            self._post(ACTION_MSG.REGISTER_DOTS, new_dots)
+        return stacks
+
+    def _send_shared(self, stacks) -> bool:
+        ring = self._frame_ring
+        entry = []
+        for pos, hashes in stacks:
+            cell = ring.cell_index(pos)
+            if cell < 0:
+                continue
+            entry.append(cell)
+            entry.append(len(hashes))
+            entry.extend(hashes)
+        if len(entry) > ring.capacity:
+            return False
+
+        slot = ring.acquire()
+        count = ring.write(slot, entry)
+        self._post(ACTION_MSG.RENDER_SHARED, (slot, count))
+        return True
+
+    def _send_render(self, stacks):
+        if self._frame_ring is not None and self._send_shared(stacks):
+            return
+
+        entry = []
+        for pos, hashes in stacks:
+            entry.append(pos)
+            entry.append(len(hashes))
+            entry.extend(hashes)
+        self._post(ACTION_MSG.RENDER, entry)
+
+    def _send_diff(self):
+        if self._pending_frame is None:
+            return
+        last_frame = self._last_frame
+        changed = [
+            (pos, hashes)
+            for pos, hashes in self._pending_frame.items()
+            if last_frame.get(pos) != hashes
+        ]
+        dirty = [pos for pos, _ in changed]
+        dirty.extend(pos for pos in last_frame if pos not in self._pending_frame)
+        if len(dirty) > 0:
+            self._post(ACTION_MSG.CLEAR_BLOCKS, dirty)
+        if len(changed) > 0:
+            self._send_render(changed)
+        self._last_frame = self._pending_frame
+        self._pending_frame = None
 
+    def _draw_grid(self, buffer: GridBuffer):
+        new_dots = []
+        for style_id in np.unique(buffer._layers).tolist():
+            if style_id != EMPTY and style_id not in self._registered_hashes:
+                dot = Dot()
+                dot.style = buffer.styles[style_id]
+                self._register(dot, style_id, new_dots)
         if len(new_dots) > 0:
-            self._msg_q.put(ACTION_MSG.REGISTER_DOTS)
-            self._data_q.put(new_dots)
+            self._post(ACTION_MSG.REGISTER_DOTS, new_dots)
+
+        data = buffer._layers.tobytes()
+        ring = self._frame_ring
+        if ring is not None and len(data) <= ring.slot_size:
+            slot = ring.acquire()
+            entry = (buffer.shape, buffer.depth, slot, ring.write_bytes(slot, data))
+        else:
+            entry = (buffer.shape, buffer.depth, None, data)
+        self._post(ACTION_MSG.RENDER_GRID, entry)
+
+    def _send_profile(self):
+        frame = self.updates_count - 1
+        timings = self._profiler.pop(frame)
+        if timings is not None:
+            self._post(ACTION_MSG.PROFILE, (frame, timings))
+
+    def draw(self, buffer: Buffer | GridBuffer):
+        with self._profiler.stage("draw"):
+            self._draw(buffer)
+
+    def _draw(self, buffer: Buffer | GridBuffer):
+        if isinstance(buffer, GridBuffer) and not self.diff:
+            self._draw_grid(buffer)
+            return
+
+        stacks = self._collect(buffer)
+        if not self.diff:
+            self._send_render(stacks)
+            return
 
-        self._msg_q.put(ACTION_MSG.RENDER)
-        self._data_q.put(entry)
+        if self._pending_frame is None:
+            self._pending_frame = {
+                pos: list(hashes) for pos, hashes in self._last_frame.items()
+            }
+        for pos, hashes in stacks:
+            self._pending_frame.setdefault(pos, []).extend(hashes)
 
     def clear(self):
-        self._msg_q.put(ACTION_MSG.CLEAR)
+        if self.diff:
+            self._pending_frame = dict()
+            return
+        self._post(ACTION_MSG.CLEAR)
 
     def present(self):
-        self._msg_q.put(ACTION_MSG.UPDATE)
+        with self._profiler.stage("send"):
+            if self.diff:
+                self._send_diff()
+        if self._profiler.enabled:
+            self._send_profile()
+        self._post(ACTION_MSG.UPDATE, self.app_frame)
 
     def quit(self):
-        self._msg_q.put(ACTION_MSG.QUIT)
+        self._post(ACTION_MSG.QUIT)
         self.running = False
 
     def setup(self):
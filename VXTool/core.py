@@ -1,6 +1,11 @@
+from bisect import bisect_left, insort
+from collections import deque
 from copy import copy, deepcopy
 from enum import Enum, auto
-from typing import Generator, Iterable, Iterator, NamedTuple
+from heapq import merge
+from operator import attrgetter
+from typing import Callable, Generator, Iterable, Iterator, NamedTuple
+from weakref import WeakValueDictionary, ref
 
 from pygame import Color as PyGameColor
 
@@ -18,8 +23,151 @@ class Color(PyGameColor):
 
 BLACK = Color(0, 0, 0, 255)
 
+STYLE_ATTRS = ("letter", "color", "backcolor", "font_name")
+TRANSITIONS_LIMIT = 64
+STYLES_RETAINED = 4096
+
+
+def _color_key(color) -> tuple | None:
+    return None if color is None else tuple(Color(color))
+
+
+class Style:
+    """Immutable dot appearance, interned to an int id.
+
+    Equal (letter, color, backcolor, font_name) records share one Style
+    object and id within a process. A Style lives while any dot holds it
+    or while it is among the last STYLES_RETAINED created, so the table
+    stays bounded. Colors are kept as rgba tuples. Ids are never reused,
+    id 0 marks an empty place.
+    `transition` caches up to TRANSITIONS_LIMIT Styles reached by changing
+    one attribute.
+    """
+
+    __slots__ = (
+        "letter",
+        "color",
+        "backcolor",
+        "font_name",
+        "id",
+        "_transitions",
+        "__weakref__",
+    )
+
+    _interned: WeakValueDictionary = WeakValueDictionary()
+    _retained: deque = deque(maxlen=STYLES_RETAINED)
+    _next_id: int = 1
+
+    def __new__(
+        cls,
+        letter: str = None,
+        color: Color = None,
+        backcolor: Color = None,
+        font_name: str | None = None,
+    ):
+        key = (letter, _color_key(color), _color_key(backcolor), font_name)
+        style = cls._interned.get(key)
+        if style is not None:
+            return style
+        style = object.__new__(cls)
+        setattr_ = object.__setattr__
+        for name, value in zip(STYLE_ATTRS, key):
+            setattr_(style, name, value)
+        setattr_(style, "id", Style._next_id)
+        setattr_(style, "_transitions", dict())
+        Style._next_id += 1
+        cls._interned[key] = style
+        cls._retained.append(style)
+        return style
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self):
+        return Style, (self.letter, self.color, self.backcolor, self.font_name)
+
+    def __hash__(self) -> int:
+        return self.id
+
+    def __repr__(self) -> str:
+        return (
+            f"Style({self.letter!r}, {self.color}, {self.backcolor}, "
+            f"{self.font_name!r})"
+        )
+
+    def transition(self, name: str, value) -> "Style":
+        key = (name, _color_key(value) if isinstance(value, PyGameColor) else value)
+        try:
+            style = self._transitions[key]()
+            if style is not None:
+                return style
+        except (KeyError, TypeError):
+            pass
+        attrs = {attr: getattr(self, attr) for attr in STYLE_ATTRS}
+        attrs[name] = value
+        style = Style(**attrs)
+        if len(self._transitions) >= TRANSITIONS_LIMIT:
+            self._transitions.clear()
+        try:
+            # weakly, so cached transitions do not keep Styles alive
+            self._transitions[key] = ref(style)
+        except TypeError:
+            pass
+        return style
+
+
+NO_STYLE = Style()
+
+
+def _style_property(name: str, to_color: bool = False) -> property:
+    def fget(dot):
+        value = getattr(dot.style, name)
+        if to_color and value is not None:
+            return Color(value)
+        return value
+
+    def fset(dot, value):
+        dot.style = dot.style.transition(name, value)
+
+    return property(fget, fset)
+
+
+class _Layout(NamedTuple):
+    names: tuple[str, ...]
+    values: attrgetter
+    has_dict: bool
+
+
+_LAYOUTS: dict[type, _Layout] = dict()
+
+
+def _layout(cls: type) -> _Layout:
+    # slot names in definition order and whether instances have a __dict__
+    layout = _LAYOUTS.get(cls)
+    if layout is None:
+        names = tuple(
+            dict.fromkeys(
+                name
+                for klass in reversed(cls.__mro__)
+                for name in klass.__dict__.get("__slots__", ())
+                if name not in ("__dict__", "__weakref__")
+            )
+        )
+        layout = _Layout(names, attrgetter(*names), cls.__dictoffset__ != 0)
+        _LAYOUTS[cls] = layout
+    return layout
+
 
 class Dot:
+    """Positioned Style.
+
+    Dot and AnimatedDot are slotted, subclasses without `__slots__` keep
+    their extra attributes in `__dict__`. `__getstate__` returns both as
+    one dict, it is what `variant`, `__str__` and pickling go through.
+    """
+
+    __slots__ = ("pos", "style", "clear")
+
     def __init__(
         self,
         pos: tuple[int, int] = None,
@@ -30,45 +178,73 @@ class Dot:
         clear: bool = True,
     ):
         self.pos: tuple[int, int] = pos
-        self.letter: str = letter
-        self.color: Color = color
-        self.backcolor: Color = backcolor
-        self.font_name: str = font_name
+        if letter is None and color is None and backcolor is None and font_name is None:
+            self.style: Style = NO_STYLE
+        else:
+            self.style: Style = Style(letter, color, backcolor, font_name)
         self.clear: str = clear
 
+    letter: str = _style_property("letter")
+    color: Color = _style_property("color", True)
+    backcolor: Color = _style_property("backcolor", True)
+    font_name: str = _style_property("font_name")
+
+    @property
+    def style_id(self) -> int:
+        return self.style.id
+
     def __str__(self) -> str:
-        attrs = []
-        for attr, value in self.__dict__.items():
+        attrs = [] if self.pos is None else [f"pos={self.pos}"]
+        for attr in STYLE_ATTRS:
+            value = getattr(self.style, attr)
             if value is not None:
                 attrs.append(f"{attr}={value}")
+        for attr, value in self.__getstate__().items():
+            if attr not in ("pos", "style") and value is not None:
+                attrs.append(f"{attr}={value}")
         return "Dot(" + ", ".join(attrs) + ")"
 
     def __repr__(self) -> str:
         return self.__str__()
 
     def __hash__(self) -> int:
-        # excluding self.pos
-        return hash(
-            (
-                self.letter,
-                self.color,
-                self.backcolor,
-                self.font_name,
-                self.clear,
-            )
-        )
+        # only the appearance, excluding self.pos and self.clear
+        return self.style.id
+
+    def __getstate__(self) -> dict:
+        layout = _layout(self.__class__)
+        state = dict(zip(layout.names, layout.values(self)))
+        if layout.has_dict:
+            state.update(self.__dict__)
+        return state
+
+    def __setstate__(self, state: dict):
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def variant(self, variant_class=None, **kwargs):
-        if variant_class is None:
-            variant_class = self.__class__
-        new_dot = variant_class()
-        for name, value in self.__dict__.items():
-            if not hasattr(new_dot, name):
-                continue
-            if name in kwargs:
-                setattr(new_dot, name, kwargs[name])
-            else:
+        if variant_class is None or variant_class is self.__class__:
+            new_dot = object.__new__(self.__class__)
+            layout = _layout(self.__class__)
+            for name, value in zip(layout.names, layout.values(self)):
+                setattr(new_dot, name, value)
+            if layout.has_dict:
+                new_dot.__dict__.update(self.__dict__)
+        else:
+            new_dot = variant_class()
+            layout = _layout(variant_class)
+            new_dot.__setstate__(
+                {
+                    name: value
+                    for name, value in self.__getstate__().items()
+                    if hasattr(new_dot, name)
+                }
+            )
+        for name, value in kwargs.items():
+            if name in layout.names or layout.has_dict and name in new_dot.__dict__:
                 setattr(new_dot, name, value)
+            elif name in STYLE_ATTRS:
+                new_dot.style = new_dot.style.transition(name, value)
         return new_dot
 
 
@@ -169,18 +345,145 @@ class ANIMATION_OP(Enum):
 class AnimationOp(NamedTuple):
     counter: int
     op_type: ANIMATION_OP
-    args: list
+    args: tuple | None
 
     def __str__(self):
         return f"{self.counter}: {self.op_type.name} {self.args}"
 
 
+_op_counter = attrgetter("counter")
+
+
+class Timeline(list):
+    """AnimationOps sorted by counter.
+
+    An op is inserted after the ops with the same counter, so ops at one
+    counter run in the order they were added.
+    """
+
+    def add(self, op: AnimationOp):
+        insort(self, op, key=_op_counter)
+
+    def add_ops(self, ops: Iterable[AnimationOp]):
+        ops = sorted(ops, key=_op_counter)
+        if not ops:
+            return
+        if not self or self[-1].counter <= ops[0].counter:
+            self.extend(ops)
+        else:
+            # stable, existing ops come first on equal counters
+            self[:] = merge(self, ops, key=_op_counter)
+
+    def find(self, counter: int) -> int:
+        """Index of the first op at or after counter."""
+        return bisect_left(self, counter, key=_op_counter)
+
+
+def _shift_op(op: AnimationOp, frames: int) -> AnimationOp:
+    if op.op_type == ANIMATION_OP.JMP:
+        return AnimationOp(op.counter + frames, op.op_type, (op.args[0] + frames,))
+    return op._replace(counter=op.counter + frames)
+
+
+class AnimationProgram:
+    """Immutable AnimationOps sorted by counter, shared between dots.
+
+    Counters and JMP targets are relative to the program start, a dot plays
+    it from its `time_offset`. `duration` defaults to one frame past the
+    last op, `concat` starts the other program there. Composing returns
+    new programs.
+    """
+
+    __slots__ = ("ops", "duration")
+
+    def __init__(self, ops: Iterable[AnimationOp] = (), duration: int | None = None):
+        ops = tuple(sorted(ops, key=_op_counter))
+        if duration is None:
+            duration = ops[-1].counter + 1 if ops else 0
+        object.__setattr__(self, "ops", ops)
+        object.__setattr__(self, "duration", duration)
+
+    @classmethod
+    def record(cls, build: Callable, *args, **kwargs) -> "AnimationProgram":
+        """Program of the ops `build(dot, *args, **kwargs)` adds to a dot."""
+        dot = AnimatedDot()
+        build(dot, *args, **kwargs)
+        return cls(dot.instructions)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self):
+        return AnimationProgram, (self.ops, self.duration)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def __getitem__(self, idx):
+        return self.ops[idx]
+
+    def __iter__(self):
+        return iter(self.ops)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, AnimationProgram):
+            return NotImplemented
+        return self.ops == other.ops and self.duration == other.duration
+
+    def __hash__(self) -> int:
+        return hash((self.ops, self.duration))
+
+    def __repr__(self) -> str:
+        return f"AnimationProgram({len(self.ops)} ops, duration={self.duration})"
+
+    def find(self, counter: int) -> int:
+        """Index of the first op at or after counter."""
+        return bisect_left(self.ops, counter, key=_op_counter)
+
+    def offset(self, frames: int) -> "AnimationProgram":
+        return AnimationProgram(
+            (_shift_op(op, frames) for op in self.ops), self.duration + frames
+        )
+
+    def concat(self, other: "AnimationProgram") -> "AnimationProgram":
+        return AnimationProgram(
+            self.ops + other.offset(self.duration).ops,
+            self.duration + other.duration,
+        )
+
+    def loop(self) -> "AnimationProgram":
+        """Program jumping back to its start after `duration` frames."""
+        jmp = AnimationOp(self.duration, ANIMATION_OP.JMP, (0,))
+        return AnimationProgram(self.ops + (jmp,), self.duration)
+
+
 class AnimatedDot(Dot):
+    """Dot following its instructions, a Timeline or a shared AnimationProgram.
+
+    frame_counter, instruction_pointer and time_offset are the cursor.
+    Ops added to a dot playing a program go to its own Timeline copy.
+    """
+
+    __slots__ = (
+        "instructions",
+        "frame_counter",
+        "instruction_pointer",
+        "time_offset",
+        "new_pos",
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.instructions: list[AnimationOp] = []
+        self.instructions: Timeline | AnimationProgram = Timeline()
         self.frame_counter = 0
         self.instruction_pointer = 0
+        self.time_offset = 0
         self.new_pos: tuple[int, int] = None
 
     def variant(self, variant_class=None, option: str = "ref", **kwargs):
@@ -200,40 +503,39 @@ class AnimatedDot(Dot):
         return new_dot
 
     def clear_state(self):
-        self.instructions = []
+        self.instructions = Timeline()
         self.frame_counter = 0
         self.instruction_pointer = 0
+        self.time_offset = 0
         self.new_pos = None
         return self
 
+    def play(self, program: AnimationProgram, delay: int = 0):
+        self.instructions = program
+        self.instruction_pointer = 0
+        self.time_offset = self.frame_counter + delay
+        return self
+
+    def _timeline(self) -> Timeline:
+        if isinstance(self.instructions, AnimationProgram):
+            program = self.instructions.offset(self.time_offset)
+            self.instructions = Timeline(program.ops)
+            self.time_offset = 0
+        return self.instructions
+
     def _add_op(self, new_op: AnimationOp):
-        idx = 0
-        for op in self.instructions:
-            if new_op.counter >= op.counter:
-                idx += 1
-            else:
-                break
-        self.instructions.insert(idx, new_op)
+        self._timeline().add(new_op)
 
     def op_set(self, delta_time: int, attr_name: str, value):
         if hasattr(self, attr_name):
+            op_time = self.frame_counter + delta_time
             if isinstance(value, Iterable):
-                for i, x in enumerate(value):
-                    self._add_op(
-                        AnimationOp(
-                            self.frame_counter + delta_time + i,
-                            ANIMATION_OP.SET,
-                            (attr_name, x),
-                        )
-                    )
-            else:
-                self._add_op(
-                    AnimationOp(
-                        self.frame_counter + delta_time,
-                        ANIMATION_OP.SET,
-                        (attr_name, value),
-                    )
+                self._timeline().add_ops(
+                    AnimationOp(op_time + i, ANIMATION_OP.SET, (attr_name, x))
+                    for i, x in enumerate(value)
                 )
+            else:
+                self._add_op(AnimationOp(op_time, ANIMATION_OP.SET, (attr_name, value)))
 
     def op_stop(self, delta_time):
         self._add_op(
@@ -249,17 +551,17 @@ class AnimatedDot(Dot):
 
     def op_move(self, delta_time: int, move_vector: tuple[int, int], repeat: int = 1):
         op_time = self.frame_counter + delta_time
-        for i in range(repeat):
-            self._add_op(AnimationOp(op_time + i, ANIMATION_OP.MOVE, (move_vector,)))
+        self._timeline().add_ops(
+            AnimationOp(op_time + i, ANIMATION_OP.MOVE, (move_vector,))
+            for i in range(repeat)
+        )
 
     def op_move_to(self, delta_time: int, new_pos: tuple[int, int]):
         op_time = self.frame_counter + delta_time
         self._add_op(AnimationOp(op_time, ANIMATION_OP.MOVE_TO, (new_pos,)))
 
     def _find_instruction_pointer(self, frame_counter):
-        for i, op in enumerate(self.instructions):
-            if op.counter <= frame_counter:
-                return i
+        return self.instructions.find(frame_counter)
 
     def advance(self):
         result = True
@@ -268,7 +570,7 @@ class AnimatedDot(Dot):
                 break
             op = self.instructions[self.instruction_pointer]
             if (
-                self.frame_counter < op.counter
+                self.frame_counter < op.counter + self.time_offset
             ):  # does nothing when no instructions for now
                 break
             match op.op_type:
@@ -277,7 +579,7 @@ class AnimatedDot(Dot):
                 case ANIMATION_OP.SET:
                     setattr(self, op.args[0], op.args[1])
                 case ANIMATION_OP.JMP:
-                    self.frame_counter = op.args[0]
+                    self.frame_counter = op.args[0] + self.time_offset
                     self.instruction_pointer = (
                         self._find_instruction_pointer(op.args[0]) - 1
                     )
@@ -0,0 +1,247 @@
+import os
+import struct
+import subprocess
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+from threading import Semaphore, Thread
+from time import perf_counter
+
+import numpy as np
+import pygame
+from pygame import Surface
+
+FORMATS = ("png", "ppm")
+FFMPEG_ARGS = (
+    "-c:v",
+    "libx264",
+    "-pix_fmt",
+    "yuv420p",
+    "-vf",
+    "scale=out_color_matrix=bt709",
+)
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + tag
+        + data
+        + struct.pack(">I", zlib.crc32(tag + data))
+    )
+
+
+def encode_png(data: bytes, size: tuple[int, int], level: int = 6) -> bytes:
+    width, height = size
+    rows = np.frombuffer(data, np.uint8).reshape(height, width * 3)
+    # Sub filter on every row: each byte minus the same byte of the left pixel
+    filtered = np.empty((height, width * 3 + 1), np.uint8)
+    filtered[:, 0] = 1
+    filtered[:, 1:4] = rows[:, :3]
+    np.subtract(rows[:, 3:], rows[:, :-3], out=filtered[:, 4:])
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"".join(
+        (
+            b"\x89PNG\r\n\x1a\n",
+            _png_chunk(b"IHDR", header),
+            _png_chunk(b"IDAT", zlib.compress(filtered.tobytes(), level)),
+            _png_chunk(b"IEND", b""),
+        )
+    )
+
+
+def encode_ppm(data: bytes, size: tuple[int, int]) -> bytes:
+    return b"P6 %d %d 255\n" % size + data
+
+
+class FrameWriter:
+    """Encodes and writes frames on a pool of threads.
+
+    `write` copies the pixels out and returns once the frame is queued, it
+    blocks while `max_pending` frames wait to be written. PNG is compressed
+    with zlib at `png_level`, which runs without the GIL, so encoding scales
+    with `workers`. PPM is written uncompressed. Errors from the workers
+    are raised by the next `write` or by `close`.
+    """
+
+    def __init__(
+        self,
+        format: str = "png",
+        png_level: int = 6,
+        workers: int | None = None,
+        max_pending: int = 8,
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"unknown export format {format!r}, expected {FORMATS}")
+        self.format: str = format
+        self.png_level: int = png_level
+        self._pool = ThreadPoolExecutor(workers or os.cpu_count())
+        self._slots = Semaphore(max_pending)
+        self._pending: set[Future] = set()
+        self.written: int = 0
+
+    @property
+    def suffix(self) -> str:
+        return "." + self.format
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _encode(self, path: Path, data: bytes, size: tuple[int, int]):
+        if self.format == "png":
+            encoded = encode_png(data, size, self.png_level)
+        else:
+            encoded = encode_ppm(data, size)
+        Path(path).write_bytes(encoded)
+
+    def _done(self, future: Future):
+        self._slots.release()
+
+    def _collect(self):
+        for future in [future for future in self._pending if future.done()]:
+            self._pending.discard(future)
+            future.result()
+            self.written += 1
+
+    def write(self, path: str | Path, surface: Surface):
+        data = pygame.image.tobytes(surface, "RGB")
+        self._slots.acquire()
+        try:
+            self._collect()
+        except Exception:
+            self._slots.release()
+            raise
+        future = self._pool.submit(self._encode, path, data, surface.get_size())
+        future.add_done_callback(self._done)
+        self._pending.add(future)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self._collect()
+
+
+class FFmpegRecorder:
+    """Streams frames into a single ffmpeg process as raw RGB video.
+
+    ffmpeg is started on the first `write`, once the frame size is known,
+    reading `rawvideo` from stdin and encoding with `codec_args` into
+    `path`. A feeder thread writes the pipe, `write` copies the pixels out
+    and returns once the frame is queued, it blocks while `max_pending`
+    frames wait. If ffmpeg exits early, the error is raised by the next
+    `write` or by `close`.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        fps: float,
+        max_pending: int = 8,
+        ffmpeg: str = "ffmpeg",
+        codec_args: tuple[str, ...] = FFMPEG_ARGS,
+    ):
+        self.path: Path = Path(path)
+        self.fps: float = fps
+        self.ffmpeg: str = ffmpeg
+        self.codec_args: tuple[str, ...] = tuple(codec_args)
+        self._queue: Queue[bytes | None] = Queue(max_pending)
+        self._process: subprocess.Popen | None = None
+        self._feeder: Thread | None = None
+        self._error: BaseException | None = None
+        self._size: tuple[int, int] | None = None
+        self._start: float = 0.0
+        self._encoded_at: float = 0.0
+        self.written: int = 0
+        self.bytes_written: int = 0
+        self.max_depth: int = 0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _command(self, size: tuple[int, int]) -> list[str]:
+        return [
+            self.ffmpeg,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{size[0]}x{size[1]}",
+            "-framerate",
+            str(self.fps),
+            "-i",
+            "-",
+            *self.codec_args,
+            str(self.path),
+        ]
+
+    def _spawn(self, size: tuple[int, int]):
+        self._size = size
+        self._process = subprocess.Popen(self._command(size), stdin=subprocess.PIPE)
+        self._start = perf_counter()
+        self._feeder = Thread(target=self._feed, daemon=True)
+        self._feeder.start()
+
+    def _feed(self):
+        while (data := self._queue.get()) is not None:
+            if self._error is not None:
+                # keep draining so `write` never blocks on a dead pipe
+                continue
+            try:
+                self._process.stdin.write(data)
+            except (BrokenPipeError, OSError) as error:
+                self._error = error
+                continue
+            self.written += 1
+            self.bytes_written += len(data)
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"ffmpeg stopped taking frames: {error}") from error
+
+    def write(self, surface: Surface):
+        size = surface.get_size()
+        if self._process is None:
+            self._spawn(size)
+        elif size != self._size:
+            raise ValueError(f"frame size {size} differs from {self._size}")
+        self._raise_error()
+        self._queue.put(pygame.image.tobytes(surface, "RGB"))
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def stats(self) -> dict:
+        if self._start:
+            elapsed = (self._encoded_at or perf_counter()) - self._start
+        else:
+            elapsed = 0.0
+        return {
+            "frames": self.written,
+            "seconds": elapsed,
+            "fps": self.written / elapsed if elapsed else 0.0,
+            "MB/s": self.bytes_written / elapsed / 1e6 if elapsed else 0.0,
+            "queue_depth": self.pending,
+            "max_queue_depth": self.max_depth,
+        }
+
+    def close(self):
+        if self._process is None:
+            return
+        self._queue.put(None)
+        self._feeder.join()
+        try:
+            self._process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        returncode = self._process.wait()
+        # stdin closing means ffmpeg has flushed the encoder too
+        self._encoded_at = perf_counter()
+        self._process = None
+        self._raise_error()
+        if returncode:
+            raise RuntimeError(f"ffmpeg exited with code {returncode}")
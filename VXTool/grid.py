@@ -0,0 +1,177 @@
+from typing import Generator, Iterator
+
+import numpy as np
+
+from .core import Dot, Style
+
+EMPTY = 0
+LAYER_DTYPE = np.int32
+
+
+class GridBuffer:
+    """Fixed size, fixed depth Buffer backed by NumPy arrays.
+
+    Every cell holds a stack of up to `depth` Style ids, bottom first.
+    Styles put since the last `clear` are kept alive in `styles`.
+    Dots outside of `shape` are dropped, putting into a full stack pushes
+    out its bottom. Dots are stored by appearance only: animated dots and
+    object identity are not preserved, `get_at` and `dot_seq` build new
+    Dot objects.
+    """
+
+    def __init__(
+        self,
+        shape: tuple[int, int],
+        depth: int = 4,
+        dot_seq: Iterator[Dot] = [],
+    ):
+        self.shape: tuple[int, int] = shape
+        self.depth: int = depth
+        self._layers = np.zeros((depth, shape[1], shape[0]), LAYER_DTYPE)
+        self._count = np.zeros((shape[1], shape[0]), np.int16)
+        self._clear = np.zeros((shape[1], shape[0]), np.bool_)
+        self.styles: dict[int, Style] = dict()
+        if dot_seq:
+            self.extend(dot_seq)
+
+    def _contains(self, pos: tuple[int, int]) -> bool:
+        return 0 <= pos[0] < self.shape[0] and 0 <= pos[1] < self.shape[1]
+
+    def is_empty(self):
+        return not self._count.any()
+
+    def _push(self, x: int, y: int, style_id: int, clear: bool):
+        if clear:
+            n = 0
+        else:
+            n = int(self._count[y, x])
+            if n == self.depth:
+                self._layers[:-1, y, x] = self._layers[1:, y, x]
+                self._clear[y, x] = False
+                n -= 1
+        if n == 0:
+            self._clear[y, x] = clear
+        self._layers[n, y, x] = style_id
+        self._count[y, x] = n + 1
+
+    def put(self, dot: Dot):
+        if not isinstance(dot, Dot) or not self._contains(dot.pos):
+            return
+        style = dot.style
+        self.styles[style.id] = style
+        self._push(dot.pos[0], dot.pos[1], style.id, dot.clear)
+
+    def _dot(self, pos: tuple[int, int], idx: int) -> Dot:
+        x, y = pos
+        dot = Dot(pos, clear=bool(self._clear[y, x]) if idx == 0 else False)
+        dot.style = self.styles[int(self._layers[idx, y, x])]
+        return dot
+
+    def get_at(self, pos: tuple[int, int], idx: int = -1):
+        if not self._contains(pos):
+            return None
+        count = int(self._count[pos[1], pos[0]])
+        if not -count <= idx < count:
+            return None
+        return self._dot(pos, idx % count)
+
+    def extend(self, dots: Iterator[Dot]):
+        for dot in dots:
+            self.put(dot)
+
+    def _remove(self, x: int, y: int, idx: int):
+        count = int(self._count[y, x])
+        self._layers[idx : count - 1, y, x] = self._layers[idx + 1 : count, y, x]
+        self._layers[count - 1, y, x] = EMPTY
+        self._count[y, x] = count - 1
+        if idx == 0:
+            self._clear[y, x] = False
+
+    def erase(self, dot: Dot):
+        if not isinstance(dot, Dot) or not self._contains(dot.pos):
+            return
+        x, y = dot.pos
+        style_id = dot.style_id
+        for idx in range(int(self._count[y, x])):
+            if self._layers[idx, y, x] == style_id:
+                self._remove(x, y, idx)
+                return
+
+    def erase_at(self, pos: tuple[int, int], idx: int = -1):
+        if not self._contains(pos):
+            return
+        count = int(self._count[pos[1], pos[0]])
+        if -count <= idx < count:
+            self._remove(pos[0], pos[1], idx % count)
+
+    def clear(self):
+        self._layers.fill(EMPTY)
+        self._count.fill(0)
+        self._clear.fill(False)
+        self.styles.clear()
+
+    def clear_at(self, pos):
+        if self._contains(pos):
+            x, y = pos
+            self._layers[:, y, x] = EMPTY
+            self._count[y, x] = 0
+            self._clear[y, x] = False
+
+    def merge(self, other):
+        if not (isinstance(other, GridBuffer) and other.shape == self.shape):
+            self.extend(other.dot_seq())
+            return
+
+        self.styles.update(other.styles)
+        occupied = other._count > 0
+        wiped = occupied & other._clear
+        self._layers[:, wiped] = EMPTY
+        self._count[wiped] = 0
+        bottom = occupied & (self._count == 0)
+        self._clear[bottom] = other._clear[bottom]
+
+        for layer in range(other.depth):
+            ys, xs = np.nonzero(other._count > layer)
+            if len(ys) == 0:
+                break
+            n = self._count[ys, xs]
+            full = n == self.depth
+            if full.any():
+                fy, fx = ys[full], xs[full]
+                self._layers[:-1, fy, fx] = self._layers[1:, fy, fx]
+                self._clear[fy, fx] = False
+                n[full] -= 1
+            self._layers[n, ys, xs] = other._layers[layer, ys, xs]
+            self._count[ys, xs] = n + 1
+
+    def edit_inp(self, pos: tuple[int, int], idx: int = -1, **kwargs):
+        old_dot = self.get_at(pos, idx)
+        if old_dot is None:
+            return
+        kwargs.pop("pos", None)
+        new_dot = old_dot.variant(**kwargs)
+        count = int(self._count[pos[1], pos[0]])
+        self.styles[new_dot.style_id] = new_dot.style
+        self._layers[idx % count, pos[1], pos[0]] = new_dot.style_id
+
+    def dot_seq(self) -> Generator:
+        for y, x in zip(*np.nonzero(self._count)):
+            pos = int(x), int(y)
+            for idx in range(int(self._count[y, x])):
+                yield self._dot(pos, idx)
+
+    def mask(self):
+        for y, x in zip(*np.nonzero(self._count)):
+            yield int(x), int(y)
+
+    def cut(self, mask: Iterator[tuple[int, int]]):
+        for pos in mask:
+            self.clear_at(pos)
+
+    @property
+    def _container(self) -> dict[tuple[int, int], list[Dot]]:
+        # materialized for consumers of the plain Buffer layout
+        container = dict()
+        for dot in self.dot_seq():
+            container.setdefault(dot.pos, []).append(dot)
+        return container
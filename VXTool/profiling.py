@@ -0,0 +1,116 @@
+import csv
+import json
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter
+
+# stages that are waits or contain other stages, left out of busy time
+IDLE_STAGES = ("app.wait", "app.tick", "callback.wait")
+NESTED_STAGES = ("callback.draw", "callback.send")
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "FrameProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, perf_counter() - self.start)
+
+
+class FrameProfiler:
+    """Seconds spent in named stages, per frame, for the last `history` frames.
+
+    `begin` starts the record of a frame, `stage` times a block into it and
+    `add` accumulates a measured duration, a stage run several times in a
+    frame is summed. Stage names are prefixed with `process`. Nothing is
+    recorded while `enabled` is False. `merge` adds the timings of another
+    process for the same frame number, so the App keeps the records of both
+    sides of the queues.
+    """
+
+    def __init__(self, process: str, history: int = 3600):
+        self.process: str = process
+        self.history: int = history
+        self.enabled: bool = False
+        self.frames: OrderedDict[int, dict[str, float]] = OrderedDict()
+        self._current: dict[str, float] | None = None
+
+    def begin(self, frame: int):
+        if not self.enabled:
+            self._current = None
+            return
+        self._current = self.frames.setdefault(frame, dict())
+        while len(self.frames) > self.history:
+            self.frames.popitem(last=False)
+
+    def add(self, name: str, seconds: float):
+        if self._current is not None:
+            name = f"{self.process}.{name}"
+            self._current[name] = self._current.get(name, 0.0) + seconds
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def merge(self, frame: int, timings: dict[str, float]):
+        if self.enabled:
+            self.frames.setdefault(frame, dict()).update(timings)
+
+    def pop(self, frame: int) -> dict[str, float] | None:
+        return self.frames.pop(frame, None)
+
+    def averages(self, last: int = 60) -> dict[str, float]:
+        """Mean seconds per stage over the `last` recorded frames."""
+        records = list(self.frames.values())[-last:]
+        totals: dict[str, float] = dict()
+        for record in records:
+            for name, seconds in record.items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return {name: total / len(records) for name, total in sorted(totals.items())}
+
+    def summary(self, last: int = 60) -> list[str]:
+        averages = self.averages(last)
+        lines = []
+        for process in ("app", "callback"):
+            stages = {
+                name: seconds
+                for name, seconds in averages.items()
+                if name.startswith(process + ".")
+            }
+            busy = sum(
+                seconds
+                for name, seconds in stages.items()
+                if name not in IDLE_STAGES and name not in NESTED_STAGES
+            )
+            lines.append(f"{process} busy {busy * 1e3:7.2f} ms")
+            lines += [
+                f"  {name.partition('.')[2]:<14} {seconds * 1e3:7.2f} ms"
+                for name, seconds in stages.items()
+            ]
+        return lines
+
+    def rows(self) -> tuple[list[str], list[list]]:
+        """Column names and one row per frame, timings in milliseconds."""
+        names = sorted({name for record in self.frames.values() for name in record})
+        rows = [
+            [frame] + [record.get(name, 0.0) * 1e3 for name in names]
+            for frame, record in self.frames.items()
+        ]
+        return ["frame"] + names, rows
+
+    def dump(self, path: str | Path):
+        """Writes the records as CSV, or JSON when `path` ends with .json."""
+        path = Path(path)
+        columns, rows = self.rows()
+        if path.suffix == ".json":
+            path.write_text(json.dumps([dict(zip(columns, row)) for row in rows]))
+            return
+        with path.open("w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            writer.writerows(rows)
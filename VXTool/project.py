@@ -6,6 +6,7 @@ from sys import modules, path
 from types import ModuleType
 
 from .core import Color
+from .export import FFMPEG_ARGS
 from .font import FontInfo
 
 CONFIG_DEFAULTS = {
@@ -18,6 +19,24 @@ CONFIG_DEFAULTS = {
     "record": (-1, -1),
     "real_time": False,
     "out_dir": Path("out"),
+    "diff": False,
+    "atlas_page_size": (1024, 1024),
+    "cache_max_entries": 16384,
+    "cache_max_bytes": 64 << 20,
+    "transport": "shared_memory",
+    "shm_slots": 3,
+    "shm_slot_size": 1 << 20,
+    "export_format": "png",
+    "export_png_level": 6,
+    "export_workers": None,
+    "export_max_pending": 8,
+    "ffmpeg_path": "ffmpeg",
+    "ffmpeg_args": FFMPEG_ARGS,
+    "sync": "lockstep",
+    "sync_ahead": 2,
+    "profile": False,
+    "profile_history": 3600,
+    "profile_file": "profile.csv",
 }
 
 
@@ -1,11 +1,15 @@
+from typing import Iterable
+
 from pygame import SRCALPHA, Rect, Surface
-from pygame._sdl2 import Renderer, Texture
+from pygame._sdl2 import Image, Renderer, Texture
 
 from .core import Color, Dot
 from .font import FontBank
 
+BLENDMODE_BLEND = 1
 
-def generate_dot_tex(dot: Dot, font_bank: FontBank, renderer: Renderer):
+
+def render_dot_surface(dot: Dot, font_bank: FontBank) -> Surface:
     font = font_bank.get(dot.font_name)
 
     face = font.render(dot.letter, False, dot.color)
@@ -19,7 +23,136 @@ def generate_dot_tex(dot: Dot, font_bank: FontBank, renderer: Renderer):
     render.fill(backcolor)
 
     render.blit(face, (0, 0))
-    return Texture.from_surface(renderer, render)
+    return render
+
+
+def generate_dot_tex(dot: Dot, font_bank: FontBank, renderer: Renderer):
+    return Texture.from_surface(renderer, render_dot_surface(dot, font_bank))
+
+
+class _Shelf:
+    __slots__ = ("height", "x", "y")
+
+    def __init__(self, y: int, height: int):
+        self.y: int = y
+        self.height: int = height
+        self.x: int = 0
+
+
+class GlyphAtlas:
+    """Packs rendered dot tiles into a few large page textures.
+
+    Tiles are placed on shelves, rows as high as the first tile put there.
+    A tile goes to the lowest fitting shelf, a new shelf is opened below the
+    last one, and a new page is created when the current ones are full.
+    Removed tiles are reused by tiles of the same size, a page whose tiles
+    have all been removed is released.
+    """
+
+    def __init__(
+        self,
+        renderer: Renderer,
+        page_size: tuple[int, int] = (1024, 1024),
+        padding: int = 1,
+    ):
+        self.renderer: Renderer = renderer
+        self.page_size: tuple[int, int] = page_size
+        self.padding: int = padding
+        self.pages: list[Texture | None] = []
+        self._shelves: list[list[_Shelf]] = []
+        self._page_tiles: list[int] = []
+        self._tiles: dict[int, tuple[int, Rect]] = dict()
+        self._free: dict[tuple[int, int], list[tuple[int, Rect]]] = dict()
+        self._used_area: int = 0
+
+    @property
+    def page_count(self) -> int:
+        return sum(page is not None for page in self.pages)
+
+    @property
+    def fill_ratio(self) -> float:
+        if not self.page_count:
+            return 0.0
+        return self._used_area / (
+            self.page_count * self.page_size[0] * self.page_size[1]
+        )
+
+    def _add_page(self) -> int:
+        page = Texture(self.renderer, self.page_size, 32)
+        page.blend_mode = BLENDMODE_BLEND
+        if None in self.pages:
+            page_idx = self.pages.index(None)
+            self.pages[page_idx] = page
+        else:
+            page_idx = len(self.pages)
+            self.pages.append(page)
+            self._shelves.append([])
+            self._page_tiles.append(0)
+        return page_idx
+
+    def _release_page(self, page_idx: int):
+        self.pages[page_idx] = None
+        self._shelves[page_idx] = []
+        for size, free in self._free.items():
+            self._free[size] = [tile for tile in free if tile[0] != page_idx]
+
+    def _place(self, page_idx: int, width: int, height: int) -> Rect | None:
+        page_w, page_h = self.page_size
+        shelves = self._shelves[page_idx]
+        best = None
+        for shelf in shelves:
+            if height <= shelf.height and shelf.x + width <= page_w:
+                if best is None or shelf.height < best.height:
+                    best = shelf
+        if best is None:
+            top = shelves[-1].y + shelves[-1].height if shelves else 0
+            if top + height > page_h or width > page_w:
+                return None
+            best = _Shelf(top, height)
+            shelves.append(best)
+        rect = Rect(best.x, best.y, width, height)
+        best.x += width
+        return rect
+
+    def _allocate(self, width: int, height: int) -> tuple[int, Rect]:
+        free = self._free.get((width, height))
+        if free:
+            return free.pop()
+        for page_idx, page in enumerate(self.pages):
+            if page is None:
+                continue
+            rect = self._place(page_idx, width, height)
+            if rect is not None:
+                return page_idx, rect
+        page_idx = self._add_page()
+        rect = self._place(page_idx, width, height)
+        if rect is None:
+            raise ValueError(
+                f"tile of size {(width, height)} exceeds atlas page {self.page_size}"
+            )
+        return page_idx, rect
+
+    def add(self, key: int, surface: Surface) -> Image:
+        width, height = surface.get_size()
+        page_idx, rect = self._allocate(width + self.padding, height + self.padding)
+        self._tiles[key] = page_idx, rect
+        self._page_tiles[page_idx] += 1
+        self._used_area += width * height
+        page = self.pages[page_idx]
+        page.update(surface, Rect(rect.topleft, (width, height)))
+        return Image(page, Rect(rect.topleft, (width, height)))
+
+    def remove(self, key: int):
+        tile = self._tiles.pop(key, None)
+        if tile is None:
+            return
+        page_idx, rect = tile
+        self._used_area -= (rect.w - self.padding) * (rect.h - self.padding)
+        self._page_tiles[page_idx] -= 1
+        if self._page_tiles[page_idx] == 0:
+            self._release_page(page_idx)
+        else:
+            self._free.setdefault(rect.size, []).append(tile)
 
 
 class Canvas:
@@ -37,6 +170,10 @@ class Canvas:
 
         self.block_size = full_res[0] // shape[0], full_res[1] // shape[1]
         self.render_tex = Texture(renderer, full_res, 32, target=True)
+        self.cell_rects: list[Rect] = [
+            self.block_rect((x, y)) for y in range(shape[1]) for x in range(shape[0])
+        ]
+        self.clear()
 
     def block_rect(self, pos: tuple[int, int]):
         return Rect(
@@ -48,7 +185,13 @@ class Canvas:
         self.renderer.draw_color = self.backcolor
         self.renderer.clear()
 
-    def render_blocks(self, blocks: list[tuple[Texture, Rect]]):
+    def clear_blocks(self, rects: Iterable[Rect]):
+        self.renderer.target = self.render_tex
+        self.renderer.draw_color = self.backcolor
+        for rect in rects:
+            self.renderer.fill_rect(rect)
+
+    def render_blocks(self, blocks: list[tuple[Texture | Image, Rect]]):
         self.renderer.target = self.render_tex
         for render, rect in blocks:
             self.renderer.blit(render, rect)
@@ -0,0 +1,82 @@
+from array import array
+from multiprocessing import Queue
+from multiprocessing.shared_memory import SharedMemory
+
+ITEM_FORMAT = "q"
+ITEM_SIZE = array(ITEM_FORMAT).itemsize
+
+
+class SharedFrameRing:
+    """Ring of shared memory slots holding packed frames.
+
+    A frame is a flat int64 sequence of `cell, length, glyph...` groups,
+    where cell is `y * width + x` and glyph is the registered dot hash.
+    Free slot indices travel through a queue: the writer acquires a slot,
+    the reader releases it once the frame is decoded.
+    """
+
+    def __init__(
+        self, shape: tuple[int, int], slots: int = 3, slot_size: int = 1 << 20
+    ):
+        self.shape: tuple[int, int] = shape
+        self.slot_size: int = slot_size
+        self._shms: list[SharedMemory] = [
+            SharedMemory(create=True, size=slot_size) for _ in range(slots)
+        ]
+        self._free_q: Queue = Queue()
+        for slot in range(slots):
+            self._free_q.put(slot)
+        self._views: list[memoryview] = []
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_views"] = []
+        return state
+
+    @property
+    def capacity(self) -> int:
+        return self.slot_size // ITEM_SIZE
+
+    def _view(self, slot: int) -> memoryview:
+        if not self._views:
+            self._views = [shm.buf.cast(ITEM_FORMAT) for shm in self._shms]
+        return self._views[slot]
+
+    def cell_index(self, pos: tuple[int, int]) -> int:
+        width, height = self.shape
+        if 0 <= pos[0] < width and 0 <= pos[1] < height:
+            return pos[1] * width + pos[0]
+        return -1
+
+    def acquire(self) -> int:
+        return self._free_q.get()
+
+    def release(self, slot: int):
+        self._free_q.put(slot)
+
+    def write(self, slot: int, items: list[int]) -> int:
+        count = len(items)
+        self._view(slot)[:count] = array(ITEM_FORMAT, items)
+        return count
+
+    def read(self, slot: int, count: int) -> memoryview:
+        return self._view(slot)[:count]
+
+    def write_bytes(self, slot: int, data: bytes) -> int:
+        size = len(data)
+        self._shms[slot].buf[:size] = data
+        return size
+
+    def read_bytes(self, slot: int, size: int) -> memoryview:
+        return self._shms[slot].buf[:size]
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        for shm in self._shms:
+            shm.close()
+
+    def unlink(self):
+        for shm in self._shms:
+            shm.unlink()